@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Compare the legacy bailout (the magnitude of z compared to a radius of 4)
+to the squared bailout, both with the same radius (to see the cost of the
+square root) and with its default radius of 2. Usage:
+
+    python benchmarks/bailout.py --res 1000 --iter 200 --repeat 3
+
+"""
+
+from juliart.engines import get_engine
+from juliart.grid import meshgrid
+import argparse
+import time
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="juliart bailout benchmark")
+    parser.add_argument("--res", dest="res", type=int, default=1000)
+    parser.add_argument("--iter", dest="iters", type=int, default=200)
+    parser.add_argument("--zoom", dest="zoom", type=float, default=1.8)
+    parser.add_argument("--repeat", dest="repeat", type=int, default=3)
+    parser.add_argument("--engine", dest="engine", type=str, default="numpy")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    engine = get_engine(args.engine)
+    za, zb = meshgrid((args.res, args.res), args.zoom)
+
+    # A few sets that are mostly exterior, mostly boundary, and mostly interior
+    cparams = [(-0.8, 0.156), (0.285, 0.01), (-0.12, 0.75)]
+    modes = [
+        ("legacy (radius 4)", {"bailout": "legacy", "radius": 4}),
+        ("squared (radius 4)", {"bailout": "squared", "radius": 4}),
+        ("squared (radius 2)", {"bailout": "squared", "radius": 2}),
+    ]
+
+    print("%-20s %10s %10s" % ("bailout", "seconds", "speedup"))
+    baseline = None
+    for name, options in modes:
+        best = None
+        for _ in range(args.repeat):
+            start = time.time()
+            for ca, cb in cparams:
+                engine(za, zb, ca, cb, iterations=args.iters, **options)
+            seconds = (time.time() - start) / len(cparams)
+            best = seconds if best is None else min(best, seconds)
+        baseline = baseline or best
+        print("%-20s %10.3f %9.2fx" % (name, best, baseline / best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Compare supersampling only the edges (--supersample-edges) to supersampling
+every pixel, for a few sets and a color mode. We report the time of each,
+and how many pixels differ from full supersampling by more than 8 levels in
+any channel (and the most any pixel differs). Usage:
+
+    python benchmarks/edges.py --res 800 --supersample 3 --color random
+
+"""
+
+from juliart.main import JuliaSet
+import argparse
+import numpy
+import time
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="juliart edges benchmark")
+    parser.add_argument("--res", dest="res", type=int, default=800)
+    parser.add_argument("--iter", dest="iters", type=int, default=300)
+    parser.add_argument("--supersample", dest="supersample", type=int, default=3)
+    parser.add_argument("--color", dest="color", type=str, default="random")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    cparams = [(-0.8, 0.156), (0.285, 0.01), (-0.4, 0.6), (-0.7269, 0.1889)]
+
+    print(
+        "%-16s %8s %8s %8s %8s %8s" % ("c", "full", "edges", "speedup", "wrong", "max")
+    )
+    for ca, cb in cparams:
+        juliaset = JuliaSet(
+            resolution=args.res,
+            iterations=args.iters,
+            color=args.color,
+            ca=ca,
+            cb=cb,
+            quiet=True,
+        )
+        juliaset.palette = juliaset.build_palette(args.iters)
+
+        start = time.time()
+        juliaset.generate_image(supersample=args.supersample)
+        full_seconds = time.time() - start
+        full = numpy.asarray(juliaset.image).astype(numpy.int16)
+
+        start = time.time()
+        juliaset.generate_image(supersample=args.supersample, supersample_edges=True)
+        edges_seconds = time.time() - start
+        edges = numpy.asarray(juliaset.image).astype(numpy.int16)
+
+        difference = numpy.abs(edges - full).max(axis=2)
+        print(
+            "%-16s %8.2f %8.2f %7.2fx %7.3f%% %8s"
+            % (
+                "%s,%s" % (ca, cb),
+                full_seconds,
+                edges_seconds,
+                full_seconds / edges_seconds,
+                100 * (difference > 8).mean(),
+                difference.max(),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
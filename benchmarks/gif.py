@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Compare writing an animation with imageio (a palette for each frame) to
+juliart's GIFWriter (one palette from the animation's colors, and only the
+pixels that changed) with its default (255) colors, and with 11, for an animation
+that varies c and a zoom with keyframes. We report the time to encode, the
+file size, and how far the decoded colors are from the frames (the mean
+absolute difference per channel, and the fraction of pixels that differ).
+Rendering the frames is not timed. Usage (imageio is needed for comparison):
+
+    python benchmarks/gif.py --res 500 --frames 30
+
+"""
+
+from juliart.colors import palette_colors
+from juliart.gif import GIFWriter
+from juliart.main import JuliaSet, JuliaSetAnimation
+from PIL import Image
+import argparse
+import imageio
+import numpy
+import os
+import tempfile
+import time
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="juliart gif benchmark")
+    parser.add_argument("--res", dest="res", type=int, default=500)
+    parser.add_argument("--iter", dest="iters", type=int, default=200)
+    parser.add_argument("--frames", dest="frames", type=int, default=30)
+    parser.add_argument("--color", dest="color", type=str, default="random")
+    return parser
+
+
+def render(animation, values, palette, color):
+    """Render the frames for a list of values (center, zoom, ca, cb).
+    """
+    frames = []
+    for value in values:
+        juliaset = JuliaSet(
+            resolution=animation.resolution,
+            iterations=animation.iterations,
+            color=color,
+            palette=palette,
+            quiet=True,
+            center=value["center"],
+            ca=value["ca"],
+            cb=value["cb"],
+        )
+        juliaset.generate_image(zoom=value["zoom"])
+        frames.append(numpy.asarray(juliaset.image))
+    return frames
+
+
+def decode(filename):
+    """Decode every frame of a gif to RGB.
+    """
+    image = Image.open(filename)
+    frames = []
+    for index in range(image.n_frames):
+        image.seek(index)
+        frames.append(numpy.asarray(image.convert("RGB")))
+    return frames
+
+
+def main():
+    args = get_parser().parse_args()
+    animation = JuliaSetAnimation(
+        resolution=args.res, iterations=args.iters, ca=-0.8, cb=0.156
+    )
+    palette = JuliaSet(
+        resolution=args.res, color=args.color, iterations=args.iters, quiet=True
+    ).build_palette(args.iters)
+
+    # A zoom (where most of each frame changes) and a c that moves
+    zoom = animation.interpolate_keyframes(
+        [{"zoom": 1.5}, {"zoom": 0.3, "center": "0.3,0.1"}], args.frames
+    )
+    moving = animation.interpolate_keyframes(
+        [{"zoom": 1.5}, {"ca": -0.75, "cb": 0.11}], args.frames
+    )
+    tmpdir = tempfile.mkdtemp()
+
+    print(
+        "%-8s %-10s %8s %8s %8s %8s"
+        % ("frames", "writer", "seconds", "KB", "error", "wrong")
+    )
+    for name, values in [("zoom", zoom), ("moving c", moving)]:
+        frames = render(animation, values, palette, args.color)
+        expected = [frame[..., :3] for frame in frames]
+
+        for writer in ["imageio", "juliart", "juliart-11"]:
+            filename = os.path.join(tmpdir, "%s-%s.gif" % (name[:4], writer))
+            start = time.time()
+            if writer == "imageio":
+                with imageio.get_writer(filename, mode="I") as fh:
+                    for frame in frames:
+                        fh.append_data(frame)
+            else:
+                colors = palette_colors(palette, args.iters, args.color == "smooth")
+                max_colors = 11 if writer == "juliart-11" else 255
+                with GIFWriter(filename, colors, max_colors=max_colors) as fh:
+                    for frame in frames:
+                        fh.append_data(frame)
+            seconds = time.time() - start
+
+            error = wrong = 0
+            for decoded, frame in zip(decode(filename), expected):
+                difference = numpy.abs(decoded.astype(numpy.int16) - frame)
+                error += difference.mean() / len(frames)
+                wrong += difference.any(axis=2).mean() / len(frames)
+            print(
+                "%-8s %-10s %8.2f %8.0f %8.2f %7.1f%%"
+                % (
+                    name,
+                    writer,
+                    seconds,
+                    os.path.getsize(filename) / 1024,
+                    error,
+                    100 * wrong,
+                )
+            )
+            os.remove(filename)
+    os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
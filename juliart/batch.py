@@ -0,0 +1,282 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from .grid import GridCache
+from .main import JuliaSet
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import csv
+import json
+import os
+import sys
+import time
+
+# Manifest columns, and the type to convert each to (csv values are strings)
+columns = {
+    "ca": float,
+    "cb": float,
+    "zoom": float,
+    "res": int,
+    "width": int,
+    "height": int,
+    "center": str,
+    "iter": int,
+    "radius": float,
+    "supersample": int,
+    "color": str,
+    "theme": str,
+    "rgb": str,
+    "text": str,
+    "fontsize": int,
+    "font": str,
+    "font_alpha": int,
+    "xcoord": int,
+    "ycoord": int,
+    "outfile": str,
+}
+
+result_columns = ["row", "outfile", "status", "render_seconds", "seconds", "error"]
+
+# Coordinate grids kept warm in each worker process, for rows that share them
+_worker_grid_cache = None
+
+
+def _init_render_worker():
+    global _worker_grid_cache
+    _worker_grid_cache = GridCache()
+
+
+def read_manifest(filename):
+    """Read a manifest of parameter sets, either json lines (one object per
+       line) or a csv file with a header. We return a list of dictionaries,
+       which are checked (see parse_row) when each is rendered.
+    """
+    if not os.path.exists(filename):
+        sys.exit("Manifest %s does not exist." % filename)
+
+    with open(filename) as fd:
+        if filename.endswith(".csv"):
+            return list(csv.DictReader(fd))
+
+        rows = []
+        for line in fd:
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                rows.append({"error": "Invalid json: %s" % exc})
+        return rows
+
+
+def parse_row(row):
+    """Check the columns of a manifest row, and convert values to the types
+       in columns. Empty values are removed so that defaults are used.
+    """
+    if "error" in row:
+        raise ValueError(row["error"])
+    unknown = set(row) - set(columns)
+    if unknown:
+        raise ValueError("Unknown parameters: %s" % ", ".join(sorted(unknown)))
+    return {
+        key: columns[key](value)
+        for key, value in row.items()
+        if value not in [None, ""]
+    }
+
+
+def generate(params):
+    """Generate a Julia Set image (with text, if provided) from a dictionary
+       of manifest parameters (see columns), and return the JuliaSet.
+    """
+    juliaset = JuliaSet(
+        resolution=params.get("res", 1000),
+        color=params.get("color", "random"),
+        iterations=params.get("iter", 200),
+        theme=params.get("theme", "random"),
+        rgb=params.get("rgb"),
+        quiet=True,
+        ca=params.get("ca"),
+        cb=params.get("cb"),
+        engine=params.get("engine", "numpy"),
+        grid_cache=params.get("grid_cache"),
+        cache=params.get("cache"),
+        center=params.get("center"),
+        width=params.get("width"),
+        height=params.get("height"),
+    )
+    juliaset.generate_image(
+        zoom=params.get("zoom", 1.8),
+        radius=params.get("radius"),
+        supersample=params.get("supersample", 1),
+    )
+
+    font = params.get("font", "OpenSans-Regular")
+    if not font.endswith(".ttf"):
+        font = "%s.ttf" % font
+    juliaset.write_text(
+        params.get("text"),
+        fontsize=params.get("fontsize", 16),
+        xcoord=params.get("xcoord", 10),
+        ycoord=params.get("ycoord", 10),
+        font=font,
+        rgb=(255, 255, 255, params.get("font_alpha", 100)),
+    )
+    return juliaset
+
+
+def render_row(index, row, defaults):
+    """Render a single row of a manifest (in a worker), and return a result
+       with timings. An error for the row (including a sys.exit from parameter
+       checking) is returned in the result instead of being raised.
+    """
+    result = {"row": index, "outfile": row.get("outfile"), "status": "ok"}
+    start = time.time()
+    try:
+        params = dict(defaults, grid_cache=_worker_grid_cache)
+        params.update(parse_row(row))
+        juliaset = generate(params)
+        result["render_seconds"] = time.time() - start
+
+        outfile = params.get("outfile")
+        if not outfile:
+            outfile = "%s.png" % juliaset.generate_name()
+        outfile = os.path.join(params.get("outdir", ""), outfile)
+        juliaset.save_image(outfile)
+        result["outfile"] = outfile
+
+    except (Exception, SystemExit) as exc:
+        result["status"] = "error"
+        result["error"] = str(exc) or exc.__class__.__name__
+
+    result["seconds"] = time.time() - start
+    return result
+
+
+def write_result(fd, writer, result):
+    """Write a single result to an open results file (a csv writer if given).
+    """
+    if writer is not None:
+        writer.writerow(result)
+    else:
+        fd.write(json.dumps(result) + "\n")
+    fd.flush()
+
+
+def render_rows(rows, indices, defaults, workers, callback):
+    """Render rows (by index) in a pool of workers, and call callback with
+       each result. We only keep as many rows in flight as there are workers.
+       If a worker dies (e.g., it runs out of memory) the pool is broken, and
+       every row in flight fails with it. We then stop, and return the rows
+       that were in flight and the rows that haven't started, to be rendered
+       again with a new pool (see run_batch).
+    """
+    pending = list(reversed(indices))
+    running = {}
+    broken = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_render_worker
+    ) as executor:
+        while (pending or running) and not broken:
+            while pending and len(running) < workers:
+                index = pending.pop()
+                future = executor.submit(render_row, index, rows[index], defaults)
+                running[future] = index
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    callback(future.result())
+                except BrokenProcessPool:
+                    broken.append(index)
+
+                # The row couldn't be sent to or from a worker
+                except Exception as exc:
+                    result = {"row": index, "status": "error"}
+                    result["error"] = str(exc) or exc.__class__.__name__
+                    callback(result)
+
+    # The rest of the rows in flight failed with the pool
+    broken += running.values()
+    return sorted(broken), list(reversed(pending))
+
+
+def run_batch(
+    manifest, results=None, workers=1, outdir=None, engine="numpy", cache=None
+):
+    """Render each row in a manifest file with a persistent pool of workers,
+       and write a results manifest (json lines, or csv if the filename ends
+       in .csv) with timings as rows finish. If a RenderCache is provided,
+       rows share it. If a worker dies, the row it was rendering is recorded
+       as an error and the pool is started again for the rest. We return the
+       list of results.
+    """
+    rows = read_manifest(manifest)
+    if not results:
+        results = "%s-results.jsonl" % os.path.splitext(manifest)[0]
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if outdir and not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    defaults = {"engine": engine, "outdir": outdir or "", "cache": cache}
+    print("Rendering %s Julia Sets with %s workers..." % (len(rows), workers))
+
+    finished = []
+    with open(results, "w") as fd:
+        writer = None
+        if results.endswith(".csv"):
+            writer = csv.DictWriter(fd, fieldnames=result_columns)
+            writer.writeheader()
+
+        def record(result):
+            finished.append(result)
+            write_result(fd, writer, result)
+            if result["status"] == "ok":
+                print(
+                    "[%s/%s] %s (%.2fs)"
+                    % (len(finished), len(rows), result["outfile"], result["seconds"])
+                )
+            else:
+                print(
+                    "[%s/%s] row %s failed: %s"
+                    % (len(finished), len(rows), result["row"], result["error"])
+                )
+
+        remaining = list(range(len(rows)))
+        while remaining:
+            broken, remaining = render_rows(rows, remaining, defaults, workers, record)
+
+            # If more than one row was in flight, render each alone to find
+            # the one(s) that killed the worker
+            if len(broken) > 1:
+                broken = [
+                    index
+                    for index in broken
+                    if render_rows(rows, [index], defaults, 1, record)[0]
+                ]
+            for index in broken:
+                record(
+                    {
+                        "row": index,
+                        "outfile": rows[index].get("outfile"),
+                        "status": "error",
+                        "error": "The worker rendering this row died "
+                        "(e.g., it ran out of memory)",
+                    }
+                )
+
+    failed = len([result for result in finished if result["status"] != "ok"])
+    print(
+        "%s rendered, %s failed. Results are in %s"
+        % (len(finished) - failed, failed, results)
+    )
+    return sorted(finished, key=lambda result: result["row"])
@@ -0,0 +1,96 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+import hashlib
+import json
+import numpy
+import os
+import tempfile
+
+
+class RenderCache:
+    """A RenderCache keeps escape time counts on disk (as compressed numpy
+       files) keyed by a hash of the parameters that determine them (c, zoom,
+       resolution, iterations, radius, and so on). Colors are not part of the
+       key, so re-coloring the same Julia Set is a cache hit. Files are touched
+       when they are read, and the least recently used are removed when the
+       cache is larger than max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def __str__(self):
+        return "[render-cache][%s]" % self.directory
+
+    def __repr__(self):
+        return self.__str__()
+
+    def key(self, **params):
+        """Generate a key from escape time parameters (keyword arguments).
+        """
+        content = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, "%s.npz" % key)
+
+    def get(self, key):
+        """Return the counts for a key, or None if we don't have them.
+        """
+        path = self.path(key)
+        try:
+            with numpy.load(path) as data:
+                counts = data["counts"]
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        return counts
+
+    def put(self, key, counts):
+        """Save counts for a key. We write to a temporary file and then move
+           it into place, so other processes never read a partial file.
+        """
+        fd, tmpfile = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                numpy.savez_compressed(fh, counts=counts)
+            os.chmod(tmpfile, 0o644)
+            os.replace(tmpfile, self.path(key))
+        finally:
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used files until we are under max_bytes.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(entry[1] for entry in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+            total -= size
@@ -10,7 +10,11 @@ with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 """
 
-from juliart.main import JuliaSet, JuliaSetAnimation
+from juliart.cache import RenderCache
+from juliart.engines import engines
+from juliart.main import JuliaSet, JuliaSetAnimation, read_counts, read_keyframes
+from juliart.render import methods
+from juliart.tiles import formats
 import juliart
 import argparse
 import sys
@@ -34,15 +38,209 @@ def get_parser():
 
     generate = subparsers.add_parser("generate", help="generate a Julia Set image")
     animate = subparsers.add_parser(
-        "animate", help="create a Julia Set animation (gif)"
+        "animate", help="create a Julia Set animation (gif, mp4 or webm)"
+    )
+    batch = subparsers.add_parser(
+        "batch", help="generate many Julia Set images from a manifest"
+    )
+    recolor = subparsers.add_parser(
+        "recolor", help="color a Julia Set image from saved escape time counts"
+    )
+
+    serve = subparsers.add_parser(
+        "serve", help="serve Julia Set images over http from a pool of workers"
+    )
+    tiles = subparsers.add_parser(
+        "tiles", help="render a tile pyramid (xyz or dzi) for a pan and zoom viewer"
+    )
+
+    tiles.add_argument(
+        "--outdir",
+        dest="outdir",
+        help="the directory to write tiles to (defaults to tiles)",
+        type=str,
+        default="tiles",
+    )
+
+    tiles.add_argument(
+        "--levels",
+        dest="levels",
+        help="the number of zoom levels, the last is tile size x 2^(levels - 1) pixels (defaults to 4)",
+        type=int,
+        default=4,
+    )
+
+    tiles.add_argument(
+        "--tile-size",
+        dest="tile_size",
+        help="the width and height of each tile (defaults to 256)",
+        type=int,
+        default=256,
+    )
+
+    tiles.add_argument(
+        "--format",
+        dest="format",
+        help="the tile layout and manifest, xyz ({z}/{x}/{y}.png and tiles.json) or dzi (defaults to xyz)",
+        choices=formats,
+        type=str,
+        default="xyz",
+    )
+
+    for option in ["--ca", "--cb"]:
+        tiles.add_argument(
+            option,
+            dest=option.strip("-"),
+            help="the %s component of the c parameter" % option.strip("-c"),
+            type=float,
+            default=None,
+        )
+
+    tiles.add_argument(
+        "--iter",
+        dest="iters",
+        help="the number of iterations per pixel (defaults to 200, or that of tiles in --outdir)",
+        type=int,
+        default=None,
+    )
+
+    tiles.add_argument(
+        "--zoom",
+        dest="zoom",
+        help="the level of zoom for the whole image (defaults to 1.8, or that of tiles in --outdir)",
+        type=float,
+        default=None,
+    )
+
+    serve.add_argument(
+        "--host",
+        dest="host",
+        help="the address to bind to (defaults to 127.0.0.1)",
+        type=str,
+        default="127.0.0.1",
+    )
+
+    serve.add_argument(
+        "--port",
+        dest="port",
+        help="the port to listen on (defaults to 8080)",
+        type=int,
+        default=8080,
+    )
+
+    serve.add_argument(
+        "--queue-size",
+        dest="queue_size",
+        help="requests to queue (beyond those rendering) before returning 503 (defaults to 8)",
+        type=int,
+        default=8,
+    )
+
+    serve.add_argument(
+        "--timeout",
+        dest="timeout",
+        help="seconds to wait for a render before returning 504 (defaults to 60)",
+        type=float,
+        default=60,
+    )
+
+    serve.add_argument(
+        "--max-res",
+        dest="max_res",
+        help="the largest resolution that can be requested (defaults to 4000)",
+        type=int,
+        default=4000,
+    )
+
+    serve.add_argument(
+        "--max-iter",
+        dest="max_iter",
+        help="the most iterations that can be requested (defaults to 5000)",
+        type=int,
+        default=5000,
+    )
+
+    serve.add_argument(
+        "--max-supersample",
+        dest="max_supersample",
+        help="the largest supersample that can be requested (defaults to 4)",
+        type=int,
+        default=4,
+    )
+
+    batch.add_argument(
+        "manifest",
+        help="a json lines or csv file with one set of parameters per image",
+    )
+
+    batch.add_argument(
+        "--results",
+        dest="results",
+        help="the results manifest to write (defaults to <manifest>-results.jsonl)",
+        type=str,
+        default=None,
+    )
+
+    batch.add_argument(
+        "--outdir",
+        dest="outdir",
+        help="a directory to write images to (defaults to the present working directory)",
+        type=str,
+        default=None,
+    )
+
+    for subparser in [batch, serve, tiles]:
+        subparser.add_argument(
+            "--workers",
+            dest="workers",
+            help="the number of processes to render with (defaults to all cores)",
+            type=int,
+            default=0,
+        )
+
+        subparser.add_argument(
+            "--engine",
+            dest="engine",
+            help="the escape time engine to use (defaults to numpy)",
+            choices=list(engines),
+            type=str,
+            default="numpy",
+        )
+
+    recolor.add_argument(
+        "counts", help="a counts file saved with juliart generate --save-counts",
+    )
+
+    generate.add_argument(
+        "--save-counts",
+        dest="save_counts",
+        help="also save the escape time counts (.npz) to recolor later",
+        type=str,
+        default=None,
+    )
+
+    generate.add_argument(
+        "--stream",
+        dest="stream",
+        help="render strips of rows and write each to the png as it's done (for very large images)",
+        default=False,
+        action="store_true",
+    )
+
+    generate.add_argument(
+        "--strip-rows",
+        dest="strip_rows",
+        help="the number of rows per strip with --stream (defaults to about a megapixel)",
+        type=int,
+        default=None,
     )
 
     generate.add_argument(
         "--radius",
         dest="radius",
-        help="the max radius to allow (default is 4)",
-        type=int,
-        default=4,
+        help="the max radius to allow (default is 2, 4 with --legacy-bailout, or 16 for smooth color)",
+        type=float,
+        default=None,
     )
 
     animate.add_argument(
@@ -101,7 +299,81 @@ def get_parser():
         default=30,
     )
 
-    for subparser in [generate, animate]:
+    animate.add_argument(
+        "--fps",
+        dest="fps",
+        help="frames per second (default is 10)",
+        type=int,
+        default=10,
+    )
+
+    animate.add_argument(
+        "--gif-colors",
+        dest="gif_colors",
+        help="the most colors for a gif (default and most is 255), fewer make a smaller gif but merge colors",
+        type=int,
+        default=255,
+    )
+
+    animate.add_argument(
+        "--keyframes",
+        dest="keyframes",
+        help="a json file with a list of keyframes (center, zoom, ca, cb) to move between",
+        type=str,
+        default=None,
+    )
+
+    animate.add_argument(
+        "--no-reuse",
+        dest="no_reuse",
+        help="With --keyframes, render every pixel of every frame (don't reuse counts from the frame before).",
+        default=False,
+        action="store_true",
+    )
+
+    for subparser in [generate, animate, recolor, tiles]:
+        subparser.add_argument(
+            "--color",
+            dest="color",
+            choices=["random", "pattern", "glow", "smooth"],
+            help="a color pattern to follow.",
+            type=str,
+            default="random",
+        )
+
+        subparser.add_argument(
+            "--rgb",
+            dest="rgb",
+            help="a specific rbg color, in format R,G,B",
+            type=str,
+            default=None,
+        )
+
+        subparser.add_argument(
+            "--theme",
+            dest="theme",
+            choices=[
+                "christmas",
+                "easter",
+                "fall",
+                "random",
+                "halloween",
+                "hanukkah",
+                "spring",
+                "summer",
+                "thanksgiving",
+                "valentine",
+                "winter",
+            ],
+            help="a theme to color the art (defaults to random colors)",
+            type=str,
+            default="random",
+        )
+
+    # Unless they are given, tiles use the colors of tiles already in --outdir
+    tiles.set_defaults(color=None, theme=None)
+
+    for subparser in [generate, animate, recolor]:
         subparser.add_argument(
             "--outfile",
             dest="outfile",
@@ -161,6 +433,7 @@ def get_parser():
             default=10,
         )
 
+    for subparser in [generate, animate]:
         subparser.add_argument(
             "--ca",
             dest="ca",
@@ -186,49 +459,35 @@ def get_parser():
         )
 
         subparser.add_argument(
-            "--iter",
-            dest="iters",
-            help="the number of iterations per pixel (defaults to 200)",
+            "--width",
+            dest="width",
+            help="the width of the image in pixels (defaults to --res)",
             type=int,
-            default=200,
+            default=None,
         )
 
         subparser.add_argument(
-            "--color",
-            dest="color",
-            choices=["random", "pattern", "glow"],
-            help="a color pattern to follow.",
-            type=str,
-            default="random",
+            "--height",
+            dest="height",
+            help="the height of the image in pixels (defaults to --res)",
+            type=int,
+            default=None,
         )
 
         subparser.add_argument(
-            "--rgb",
-            dest="rgb",
-            help="a specific rbg color, in format R,G,B",
+            "--center",
+            dest="center",
+            help="the center of the image as x,y, with as many digits as you need for a deep zoom (defaults to 0,0)",
             type=str,
             default=None,
         )
 
         subparser.add_argument(
-            "--theme",
-            dest="theme",
-            choices=[
-                "christmas",
-                "easter",
-                "fall",
-                "random",
-                "halloween",
-                "hanukkah",
-                "spring",
-                "summer",
-                "thanksgiving",
-                "valentine",
-                "winter",
-            ],
-            help="a theme to color the art (defaults to random colors)",
-            type=str,
-            default="random",
+            "--iter",
+            dest="iters",
+            help="the number of iterations per pixel (defaults to 200)",
+            type=int,
+            default=200,
         )
 
         subparser.add_argument(
@@ -239,6 +498,91 @@ def get_parser():
             default=1.8,
         )
 
+        subparser.add_argument(
+            "--engine",
+            dest="engine",
+            help="the escape time engine to use (defaults to numpy)",
+            choices=list(engines),
+            type=str,
+            default="numpy",
+        )
+
+        subparser.add_argument(
+            "--periodicity",
+            dest="periodicity",
+            help="stop early for points caught in a cycle, optionally with a tolerance (defaults to 1e-10)",
+            nargs="?",
+            const=1e-10,
+            type=float,
+            default=None,
+        )
+
+        subparser.add_argument(
+            "--legacy-bailout",
+            dest="legacy_bailout",
+            help="compare the magnitude of z to the radius (slower) to reproduce older images",
+            default=False,
+            action="store_true",
+        )
+
+        subparser.add_argument(
+            "--method",
+            dest="method",
+            help="render every pixel (brute) or subdivide rectangles and fill those with a uniform border (adaptive)",
+            choices=methods,
+            type=str,
+            default="brute",
+        )
+
+        subparser.add_argument(
+            "--supersample",
+            dest="supersample",
+            help="anti-alias by rendering N x N subsamples for each pixel (defaults to 1)",
+            type=int,
+            default=1,
+        )
+
+        subparser.add_argument(
+            "--supersample-edges",
+            dest="supersample_edges",
+            help="only supersample pixels with a different color than a neighbor (faster)",
+            default=False,
+            action="store_true",
+        )
+
+        subparser.add_argument(
+            "--no-symmetry",
+            dest="no_symmetry",
+            help="render every pixel, instead of mirroring half of a centered image",
+            default=False,
+            action="store_true",
+        )
+
+        subparser.add_argument(
+            "--workers",
+            dest="workers",
+            help="the number of processes to render with (0 uses all cores, defaults to 1)",
+            type=int,
+            default=1,
+        )
+
+    for subparser in [generate, animate, batch, serve]:
+        subparser.add_argument(
+            "--cache-dir",
+            dest="cache_dir",
+            help="a directory to cache escape time counts in, to skip repeated renders",
+            type=str,
+            default=None,
+        )
+
+        subparser.add_argument(
+            "--cache-size",
+            dest="cache_size",
+            help="the max size of the cache directory in MB (defaults to 1024)",
+            type=int,
+            default=1024,
+        )
+
     return parser
 
 
@@ -262,8 +606,21 @@ def main():
         if not args.font.endswith(".ttf"):
             font = "%s.ttf" % (font)
 
+    # A cache for escape time counts, shared by all renders
+    cache = None
+    if getattr(args, "cache_dir", None):
+        cache = RenderCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+
     # Initialize the JuliaSet
     if args.command == "generate":
+        if args.stream and (args.save_counts or args.supersample_edges):
+            sys.exit(
+                "--stream can't be used with --save-counts or --supersample-edges."
+            )
+        if args.save_counts and args.supersample > 1 and not args.supersample_edges:
+            sys.exit(
+                "--save-counts can't be used with --supersample (there are no counts for each pixel)."
+            )
         juliaset = JuliaSet(
             resolution=args.res,
             color=args.color,
@@ -272,8 +629,45 @@ def main():
             theme=args.theme,
             rgb=args.rgb,
             iterations=args.iters,
+            engine=args.engine,
+            workers=args.workers,
+            symmetric=not args.no_symmetry,
+            method=args.method,
+            cache=cache,
+            center=args.center,
+            width=args.width,
+            height=args.height,
         )
-        juliaset.generate_image(zoom=args.zoom, radius=args.radius)
+
+        # A streamed image is written as it's rendered, text and all
+        if args.stream:
+            juliaset.generate_stream(
+                outfile=args.outfile,
+                zoom=args.zoom,
+                radius=args.radius,
+                periodicity=args.periodicity,
+                bailout="legacy" if args.legacy_bailout else "squared",
+                supersample=args.supersample,
+                rows=args.strip_rows,
+                text=args.text,
+                fontsize=args.fontsize,
+                xcoord=args.xcoord,
+                ycoord=args.ycoord,
+                font=font,
+                rgb=(255, 255, 255, args.font_alpha),
+            )
+            return
+
+        juliaset.generate_image(
+            zoom=args.zoom,
+            radius=args.radius,
+            periodicity=args.periodicity,
+            bailout="legacy" if args.legacy_bailout else "squared",
+            supersample=args.supersample,
+            supersample_edges=args.supersample_edges,
+        )
+        if args.save_counts:
+            juliaset.save_counts(args.save_counts)
 
         # Add text, if the user wants to (args.text will be checked to be None)
         juliaset.write_text(
@@ -301,6 +695,14 @@ def main():
             iterations=args.iters,
             zoom_max=args.zoom_max,
             zoom_min=args.zoom_min,
+            engine=args.engine,
+            workers=args.workers,
+            symmetric=not args.no_symmetry,
+            method=args.method,
+            cache=cache,
+            center=args.center,
+            width=args.width,
+            height=args.height,
         )
 
         juliaset.generate_animation(
@@ -316,6 +718,88 @@ def main():
             fontsize=args.fontsize,
             xcoord=args.xcoord,
             ycoord=args.ycoord,
+            periodicity=args.periodicity,
+            bailout="legacy" if args.legacy_bailout else "squared",
+            supersample=args.supersample,
+            supersample_edges=args.supersample_edges,
+            keyframes=read_keyframes(args.keyframes) if args.keyframes else None,
+            reuse=not args.no_reuse,
+            fps=args.fps,
+            gif_colors=args.gif_colors,
+        )
+
+    elif args.command == "recolor":
+
+        # Color saved counts, without rendering them again
+        data = read_counts(args.counts)
+        juliaset = JuliaSet(
+            width=data["counts"].shape[1],
+            height=data["counts"].shape[0],
+            color=args.color,
+            ca=data["ca"],
+            cb=data["cb"],
+            theme=args.theme,
+            rgb=args.rgb,
+            iterations=data["iterations"],
+        )
+        juliaset.apply_colors(data["counts"], data["iterations"])
+        juliaset.write_text(
+            args.text,
+            fontsize=args.fontsize,
+            xcoord=args.xcoord,
+            ycoord=args.ycoord,
+            font=font,
+            rgb=(255, 255, 255, args.font_alpha),
+        )
+        juliaset.save_image(args.outfile)
+
+    elif args.command == "batch":
+        from juliart.batch import run_batch
+
+        results = run_batch(
+            args.manifest,
+            results=args.results,
+            workers=args.workers,
+            outdir=args.outdir,
+            engine=args.engine,
+            cache=cache,
+        )
+        if any(result["status"] != "ok" for result in results):
+            sys.exit(1)
+
+    elif args.command == "tiles":
+        from juliart.tiles import generate_tiles
+
+        generate_tiles(
+            args.outdir,
+            levels=args.levels,
+            tile_size=args.tile_size,
+            fmt=args.format,
+            zoom=args.zoom,
+            workers=args.workers,
+            ca=args.ca,
+            cb=args.cb,
+            color=args.color,
+            theme=args.theme,
+            rgb=args.rgb,
+            iterations=args.iters,
+            engine=args.engine,
+        )
+
+    elif args.command == "serve":
+        from juliart.server import serve
+
+        serve(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            timeout=args.timeout,
+            max_res=args.max_res,
+            max_iter=args.max_iter,
+            max_supersample=args.max_supersample,
+            engine=args.engine,
+            cache=cache,
         )
 
     else:
@@ -11,9 +11,13 @@ Modified from https://github.com/Visual-mov/Colorful-Julia (MIT License)
 """
 
 from random import randint, choice
+import numpy
 import os
 import sys
 
+# Smooth (float) counts are colored with this many steps between two colors
+smooth_steps = 16
+
 christmas_colors = [
     (179, 0, 12),
     (220, 61, 42),
@@ -105,3 +109,54 @@ def get_theme_colors(theme):
         return choice(winter_colors)
     else:
         return (randint(20, 200), randint(20, 200), randint(20, 200))
+
+
+def apply_palette(counts, palette, iterations):
+    """Color an array of counts by looking them up in a palette (a list of RGB
+       or RGBA colors), and return an array of RGBA values. A palette can have
+       any number of colors, and counts are scaled to it so that iterations
+       (the max) is the last color. Float (smooth) counts are colored between
+       the two palette colors on either side.
+    """
+    counts = numpy.asarray(counts)
+    palette = numpy.asarray(palette, dtype=numpy.uint8)
+
+    if palette.ndim != 2 or palette.shape[1] not in [3, 4]:
+        sys.exit("A palette must be a list of RGB or RGBA colors.")
+    if palette.shape[1] == 3:
+        alpha = numpy.full((len(palette), 1), 255, dtype=numpy.uint8)
+        palette = numpy.hstack([palette, alpha])
+
+    # Float counts index a finer palette, blended between each two colors
+    if counts.dtype.kind == "f":
+        steps = smooth_steps
+        position = numpy.linspace(0, len(palette) - 1, (len(palette) - 1) * steps + 1)
+        palette = numpy.stack(
+            [
+                numpy.interp(position, numpy.arange(len(palette)), channel)
+                for channel in palette.T
+            ],
+            axis=1,
+        )
+        palette = (palette + 0.5).astype(numpy.uint8)
+        scale = (len(palette) - 1) / iterations
+        counts = (counts * numpy.float32(scale) + numpy.float32(0.5)).astype(
+            numpy.int64
+        )
+        return palette[counts]
+
+    if len(palette) != iterations + 1:
+        counts = counts.astype(numpy.int64) * (len(palette) - 1) // iterations
+    return palette[counts]
+
+
+def palette_colors(palette, iterations, smooth=False):
+    """Return every color (RGBA) that apply_palette can give for a palette and
+       number of iterations, e.g., to build the palette for a gif up front.
+    """
+    if smooth:
+        size = (len(palette) - 1) * smooth_steps + 1
+        counts = numpy.linspace(0, iterations, size, dtype=numpy.float32)
+    else:
+        counts = numpy.arange(iterations + 1)
+    return apply_palette(counts, palette, iterations)
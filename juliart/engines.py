@@ -0,0 +1,291 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Modified from https://github.com/Visual-mov/Colorful-Julia (MIT License)
+
+"""
+
+from decimal import Decimal, localcontext
+from math import log10, sqrt
+import numpy
+import sys
+
+# The default radius for each bailout. Legacy compares the magnitude of z to
+# the radius (4 by default), squared compares the squared magnitude to the
+# radius squared, and so doesn't need a square root each iteration.
+bailouts = {"squared": 2, "legacy": 4}
+
+# The default radius for smooth counts. Past a radius of 2 the continuous count
+# is only approximate (about 0.05 of an iteration off on average, and 0.3 at
+# most), and by 16 it's within 0.001, for the same time
+smooth_radius = 16
+
+
+def get_threshold(radius=None, bailout="squared"):
+    """Return the escape threshold to compare to for a bailout (see bailouts)
+       and radius. If the radius is not set, we use the bailout's default.
+    """
+    if bailout not in bailouts:
+        sys.exit(
+            "Bailout %s is not valid, choices are %s" % (bailout, ", ".join(bailouts))
+        )
+    if radius is None:
+        radius = bailouts[bailout]
+    if bailout == "squared":
+        return radius * radius
+    return radius
+
+
+def smooth_counts(i, magnitude, iterations):
+    """Return the normalized (continuous) iteration count for points that
+       escaped at iteration i with a squared magnitude of z. This subtracts
+       log2(log|z|), so the count doesn't jump from one band to the next.
+       We keep escaped points below iterations, which is for the interior.
+    """
+    smooth = i + 1 - numpy.log2(numpy.log(magnitude) / 2)
+    return numpy.clip(smooth, 0, iterations - 1)
+
+
+def python_engine(
+    za,
+    zb,
+    ca,
+    cb,
+    iterations=200,
+    radius=None,
+    periodicity=None,
+    bailout="squared",
+    smooth=False,
+):
+    """The reference escape time engine, a pure Python loop over each point.
+       za and zb are arrays with the real and imaginary starting coordinates,
+       and we return an array of the same shape with the iteration (i) at
+       which each point escaped, or iterations if it never did. If periodicity
+       (a tolerance) is set, points that fall into a cycle stop early. If
+       smooth is True, we return float counts instead (see smooth_counts).
+    """
+    za = numpy.asarray(za, dtype=numpy.float64)
+    zb = numpy.asarray(zb, dtype=numpy.float64)
+    counts = numpy.empty(za.shape, dtype=numpy.float64 if smooth else numpy.int64)
+    threshold = get_threshold(radius, bailout)
+    legacy = bailout == "legacy"
+
+    for index, (a, b) in enumerate(zip(za.flat, zb.flat)):
+        a = float(a)
+        b = float(b)
+        i = 0
+
+        # Brent's cycle detection compares to a point saved at powers of two
+        saved_a, saved_b, check = a, b, 1
+
+        # iterations are the number of recursions of the formula we want to do
+        # we consider za the real component, and zb the imaginary component
+        # see https://www.youtube.com/watch?v=fAsaSkmbF5s for how equations derived
+        while i < iterations:
+            tmp = 2 * a * b
+            a = a * a - b * b + ca
+            b = tmp + cb
+            if legacy:
+                if sqrt(a * a + b * b) > threshold:
+                    break
+            elif a * a + b * b > threshold:
+                break
+            i += 1
+            if periodicity:
+                if i == check:
+                    saved_a, saved_b, check = a, b, check * 2
+                elif abs(a - saved_a) < periodicity and abs(b - saved_b) < periodicity:
+                    i = iterations
+                    break
+        if smooth and i < iterations:
+            counts.flat[index] = smooth_counts(i, a * a + b * b, iterations)
+        else:
+            counts.flat[index] = i
+    return counts
+
+
+def numpy_engine(
+    za,
+    zb,
+    ca,
+    cb,
+    iterations=200,
+    radius=None,
+    periodicity=None,
+    bailout="squared",
+    smooth=False,
+):
+    """A vectorized escape time engine. We iterate all points at once, and
+       drop points from the active set as soon as they escape so that later
+       iterations only do work for the points that are left. The operations
+       are done in the same order as the python engine, so counts are identical.
+       If periodicity (a tolerance) is set, points that fall into a cycle are
+       marked as interior and dropped as well. The legacy bailout (with a
+       radius of 4) reproduces images from before the squared bailout. If
+       smooth is True, we return float counts (see smooth_counts) computed
+       from z as points escape.
+    """
+    shape = numpy.shape(za)
+    za = numpy.array(za, dtype=numpy.float64).ravel()
+    zb = numpy.array(zb, dtype=numpy.float64).ravel()
+
+    threshold = get_threshold(radius, bailout)
+    legacy = bailout == "legacy"
+
+    # Points that never escape keep the max value
+    dtype = numpy.float64 if smooth else numpy.int64
+    counts = numpy.full(za.size, iterations, dtype=dtype)
+    active = numpy.arange(za.size)
+
+    # Brent's cycle detection compares to points saved at powers of two
+    saved_a, saved_b, check = za, zb, 1
+
+    for i in range(iterations):
+        tmp = 2 * za * zb
+        za = za * za - zb * zb + ca
+        zb = tmp + cb
+        magnitude = za * za + zb * zb
+        if legacy:
+            done = numpy.sqrt(magnitude) > threshold
+        else:
+            done = magnitude > threshold
+        if smooth:
+            counts[active[done]] = smooth_counts(i, magnitude[done], iterations)
+        else:
+            counts[active[done]] = i
+
+        if periodicity:
+            if i + 1 == check:
+                saved_a, saved_b, check = za, zb, check * 2
+            else:
+                done |= (numpy.abs(za - saved_a) < periodicity) & (
+                    numpy.abs(zb - saved_b) < periodicity
+                )
+
+        if done.any():
+            keep = ~done
+            active = active[keep]
+            za = za[keep]
+            zb = zb[keep]
+            if periodicity:
+                saved_a = saved_a[keep]
+                saved_b = saved_b[keep]
+            if not active.size:
+                break
+
+    return counts.reshape(shape)
+
+
+def reference_orbit(center, ca, cb, iterations=200, threshold=4, digits=30):
+    """Iterate the center point with decimal arithmetic (digits significant
+       digits) until it escapes (its squared magnitude goes over threshold)
+       or we do iterations, and return the orbit as a complex array (each
+       point is close enough to 1 that a double is plenty to store it).
+    """
+    with localcontext() as context:
+        context.prec = digits
+        a, b = Decimal(center[0]), Decimal(center[1])
+        ca, cb = Decimal(ca), Decimal(cb)
+        threshold = Decimal(threshold)
+        orbit = [complex(a, b)]
+        for i in range(iterations):
+            a, b = a * a - b * b + ca, 2 * a * b + cb
+            orbit.append(complex(a, b))
+            if a * a + b * b > threshold:
+                break
+    return numpy.array(orbit, dtype=numpy.complex128)
+
+
+def perturbation_engine(
+    za,
+    zb,
+    ca,
+    cb,
+    iterations=200,
+    radius=None,
+    periodicity=None,
+    bailout="squared",
+    smooth=False,
+    center=(0, 0),
+):
+    """A deep zoom escape time engine. Here za and zb are offsets from a center
+       point (a pair of decimals, or strings, with as many digits as needed)
+       instead of the points themselves. We iterate the center once with
+       decimal arithmetic (see reference_orbit), and then each offset (delta)
+       with doubles, since if z = Z + d then d goes to 2Zd + d^2 when Z goes
+       to Z^2 + c. Offsets can be as small as 1e-300, far past where points
+       themselves can be told apart as doubles (about 1e-15). If the reference
+       escapes first, points that are left start again from the start of the
+       reference (rebasing), by then they are far enough from it that a double
+       is enough. Counts are the same as for the numpy engine (except for the
+       center itself, which escapes when the reference runs out of digits).
+       Periodicity checking isn't used here.
+    """
+    shape = numpy.shape(za)
+    delta = (
+        numpy.array(za, dtype=numpy.float64).ravel()
+        + 1j * numpy.array(zb, dtype=numpy.float64).ravel()
+    )
+
+    threshold = get_threshold(radius, bailout)
+    legacy = bailout == "legacy"
+    escape = threshold * threshold if legacy else threshold
+
+    # Enough digits for the smallest offset, and then some
+    smallest = numpy.abs(delta[delta != 0]).min() if delta.any() else 1.0
+    digits = max(30, int(-log10(smallest)) + 30)
+    orbit = reference_orbit(center, ca, cb, iterations, max(escape, 4), digits)
+    last = len(orbit) - 1
+
+    dtype = numpy.float64 if smooth else numpy.int64
+    counts = numpy.full(delta.size, iterations, dtype=dtype)
+    active = numpy.arange(delta.size)
+    index = 0
+
+    for i in range(iterations):
+        delta = (2 * orbit[index] + delta) * delta
+        index += 1
+        z = orbit[index] + delta
+        magnitude = z.real * z.real + z.imag * z.imag
+        if legacy:
+            done = numpy.sqrt(magnitude) > threshold
+        else:
+            done = magnitude > threshold
+        if smooth:
+            counts[active[done]] = smooth_counts(i, magnitude[done], iterations)
+        else:
+            counts[active[done]] = i
+
+        # When the reference escapes, points left start again from its start
+        if index == last:
+            delta = z - orbit[0]
+            index = 0
+
+        if done.any():
+            keep = ~done
+            active = active[keep]
+            delta = delta[keep]
+            if not active.size:
+                break
+
+    return counts.reshape(shape)
+
+
+engines = {
+    "numpy": numpy_engine,
+    "python": python_engine,
+    "perturbation": perturbation_engine,
+}
+
+
+def get_engine(name):
+    """Return an escape time engine by name, exiting if it doesn't exist.
+    """
+    if name not in engines:
+        sys.exit("Engine %s is not valid, choices are %s" % (name, ", ".join(engines)))
+    return engines[name]
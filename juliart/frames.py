@@ -0,0 +1,63 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+import numpy
+import os
+
+
+class FrameStore:
+    """A FrameStore keeps a fixed number of equally sized frames (pixel arrays)
+       in a memory-mapped file, so that an animation can play them back (e.g.,
+       in reverse to loop) without holding all of them in memory or writing
+       and reading them as image files. The file is allocated when the first
+       frame is added, since that's when we know the frame shape.
+    """
+
+    def __init__(self, filename, frames):
+        self.filename = filename
+        self.size = frames
+        self.count = 0
+        self.frames = None
+
+    def __str__(self):
+        return "[frame-store][frames:%s/%s]" % (self.count, self.size)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, frame):
+        """Add the next frame to the store.
+        """
+        frame = numpy.asarray(frame)
+        if self.frames is None:
+            self.frames = numpy.memmap(
+                self.filename,
+                dtype=frame.dtype,
+                mode="w+",
+                shape=(self.size,) + frame.shape,
+            )
+        self.frames[self.count] = frame
+        self.count += 1
+
+    def reverse(self):
+        """Yield the stored frames, last to first.
+        """
+        for index in reversed(range(self.count)):
+            yield numpy.asarray(self.frames[index])
+
+    def close(self):
+        """Release the memory map and remove the backing file.
+        """
+        self.frames = None
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,246 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from PIL import Image
+import numpy
+import struct
+import sys
+
+
+def global_palette(colors, size=255, frame=None, max_pixels=2 ** 18):
+    """Return a palette of at most size RGB colors for a list of RGB or RGBA
+       colors (e.g., every color an animation can have, see
+       colors.palette_colors). If there are more colors than that, they are
+       reduced with median cut, weighted by how often each is in a frame
+       (e.g., the first of an animation) if one is given.
+    """
+    colors = numpy.unique(numpy.asarray(colors, dtype=numpy.uint8)[:, :3], axis=0)
+    if len(colors) <= size:
+        return colors
+
+    # Every color is counted once, and then each pixel (of a sample)
+    if frame is not None:
+        pixels = numpy.asarray(frame, dtype=numpy.uint8)[..., :3].reshape(-1, 3)
+        step = max(1, len(pixels) // max_pixels)
+        colors = numpy.concatenate([colors, pixels[::step]])
+
+    # Quantize method 0 is median cut
+    image = Image.fromarray(colors[None, :, :], "RGB").quantize(size, method=0)
+    palette = numpy.array(image.getpalette()[: size * 3], dtype=numpy.uint8)
+    return palette.reshape(-1, 3)
+
+
+def color_keys(colors):
+    """Return an integer key (0xBBGGRR) for each of an array of RGB or RGBA
+       colors. For RGBA frames (e.g., from colors.apply_palette) on a little
+       endian machine, this is just each pixel viewed as a 32 bit integer.
+    """
+    colors = numpy.asarray(colors)
+    if (
+        colors.dtype == numpy.uint8
+        and colors.shape[-1] == 4
+        and colors.flags.c_contiguous
+        and sys.byteorder == "little"
+    ):
+        return colors.view(numpy.uint32)[..., 0] & 0xFFFFFF
+    colors = colors.astype(numpy.int32)
+    return colors[..., 0] | (colors[..., 1] << 8) | (colors[..., 2] << 16)
+
+
+def unchanged_runs(unchanged, length=16):
+    """Given a mask of pixels that haven't changed since the last frame, return
+       the ones that are in a run of at least length along a row. Making those
+       transparent compresses well, while a scattering of transparent pixels
+       (e.g., where a few pixels didn't change) breaks up runs of colors.
+    """
+    height, width = unchanged.shape
+    padded = numpy.zeros((height, width + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = unchanged
+    steps = numpy.diff(padded.ravel())
+    starts, ends = numpy.flatnonzero(steps == 1), numpy.flatnonzero(steps == -1)
+    keep = ends - starts >= length
+
+    # Mark the start (+1) and end (-1) of each run, and the sum is inside one
+    marks = numpy.zeros(padded.size, dtype=numpy.int8)
+    marks[starts[keep] + 1] = 1
+    marks[ends[keep] + 1] = -1
+    runs = numpy.cumsum(marks, dtype=numpy.int8).reshape(height, width + 2)
+    return runs[:, 1:-1] > 0
+
+
+class GIFWriter:
+    """A GIFWriter writes an animated gif one frame at a time, with a single
+       (global) palette for every frame. Since the colors of an animation
+       come from its palette, we know them up front (see global_palette) and
+       a frame is just the palette index of each pixel. After the first
+       frame, only the rectangle that changed is written, with runs of pixels
+       that didn't change as transparent when they cover much of it. The
+       palette (and the size of the codes that compress each frame) is only
+       as large as the colors need, e.g., 16 for 11 colors and a transparent
+       index. With more than max_colors colors (at most 255), they are reduced
+       to the ones that best fit the first frame, which makes a smaller file,
+       but colors that are reduced are no longer exact.
+       Frames are added with append_data, the same as an imageio writer.
+    """
+
+    def __init__(self, filename, colors, fps=10, loop=0, max_colors=255):
+        if max_colors < 2:
+            sys.exit("A gif needs at least 2 colors, found %s" % max_colors)
+        self.filename = filename
+        self.colors = colors
+        self.max_colors = min(max_colors, 255)
+
+        # Transparent runs must cover this much of a frame's changed rectangle
+        self.min_runs = 0.4
+        self.palette = None
+        self.delay = int(round(100.0 / fps))
+        self.loop = loop
+        self.shape = None
+        self.frames = 0
+        self.previous = None
+        self.fh = open(filename, "wb")
+
+    def __str__(self):
+        return "[gif-writer][%s][frames:%s][colors:%s]" % (
+            self.filename,
+            self.frames,
+            self.max_colors if self.palette is None else len(self.palette),
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fh.close()
+
+    def start(self, frame):
+        """Build the global palette (to fit the first frame) and write the
+           header for frames with the same shape, with a loop (0 is forever).
+        """
+        self.palette = global_palette(self.colors, self.max_colors, frame)
+
+        # The palette index for pixels that haven't changed since the last
+        # frame, and the bits for each index (at least 2, for a gif)
+        self.transparent = len(self.palette)
+        self.bits = max(2, int(self.transparent).bit_length())
+
+        # The palette index for every color we've seen, or -1 if we haven't
+        self.lookup = numpy.full(2 ** 24, -1, dtype=numpy.int16)
+        self.lookup[color_keys(self.palette)] = numpy.arange(len(self.palette))
+
+        height, width = frame.shape[:2]
+        palette = numpy.zeros((2 ** self.bits, 3), dtype=numpy.uint8)
+        palette[: len(self.palette)] = self.palette
+
+        # A global color table of 2^bits colors, with 8 bits per channel
+        flags = 0xF0 | (self.bits - 1)
+        self.fh.write(b"GIF89a" + struct.pack("<HHBBB", width, height, flags, 0, 0))
+        self.fh.write(palette.tobytes())
+        self.fh.write(b"!\xff\x0bNETSCAPE2.0\x03\x01")
+        self.fh.write(struct.pack("<H", self.loop) + b"\x00")
+        self.shape = frame.shape
+
+    def index(self, frame):
+        """Return the palette index for each pixel of a frame, which is the
+           exact color if it's in the palette, and otherwise the closest one
+           (e.g., for text, or an anti-aliased edge).
+        """
+        keys = color_keys(frame)
+        indices = self.lookup[keys]
+        missing = indices < 0
+        if missing.any():
+            new = numpy.unique(keys[missing])
+            colors = numpy.stack([new & 255, (new >> 8) & 255, new >> 16], axis=1)
+            colors = colors.astype(numpy.int32)
+            palette = self.palette.astype(numpy.int32)
+            for start in range(0, len(new), 4096):
+                chunk = colors[start : start + 4096]
+                distance = ((chunk[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+                self.lookup[new[start : start + 4096]] = distance.argmin(axis=1)
+            indices = self.lookup[keys]
+        return indices.astype(numpy.uint8)
+
+    def append_data(self, frame):
+        """Add the next frame, an array of RGB or RGBA values (uint8) with
+           shape (height, width, channels).
+        """
+        frame = numpy.asarray(frame)
+        if frame.ndim != 3 or frame.shape[2] not in [3, 4]:
+            sys.exit(
+                "Frames must have shape (height, width, 3 or 4), found %s"
+                % (frame.shape,)
+            )
+        if self.shape is None:
+            self.start(frame)
+        if frame.shape[:2] != self.shape[:2]:
+            sys.exit(
+                "Frames must all have shape %s, found %s" % (self.shape, frame.shape)
+            )
+
+        indices = self.index(frame)
+        if self.previous is None:
+            data = self.encode(indices)
+
+        # Only write the rectangle that changed. If runs of unchanged pixels
+        # cover much of it, making them transparent is smaller
+        else:
+            changed = indices != self.previous
+            rows = numpy.flatnonzero(changed.any(axis=1))
+            columns = numpy.flatnonzero(changed.any(axis=0))
+            if len(rows) == 0:
+                data = self.encode(
+                    numpy.full((1, 1), self.transparent, dtype=numpy.uint8)
+                )
+            else:
+                y0, y1 = rows[0], rows[-1] + 1
+                x0, x1 = columns[0], columns[-1] + 1
+                crop = indices[y0:y1, x0:x1]
+                unchanged = ~changed[y0:y1, x0:x1]
+                if unchanged.mean() >= self.min_runs:
+                    runs = unchanged_runs(unchanged)
+                    if runs.mean() >= self.min_runs:
+                        crop = numpy.where(runs, self.transparent, crop)
+                data = self.encode(crop.astype(numpy.uint8), (int(x0), int(y0)))
+        self.previous = indices
+        self.fh.write(data)
+        self.frames += 1
+
+    def encode(self, indices, offset=(0, 0)):
+        """Encode an array of palette indices as a frame (at an offset) and
+           return the bytes. Frames are left in place (disposal 1) for the
+           next frame to draw over. Pillow compresses the indices (with codes
+           of self.bits, where its own gif writer always uses 8).
+        """
+        height, width = indices.shape
+
+        # Graphics control (disposal, delay in 1/100s, transparent index)
+        data = b"!\xf9\x04" + struct.pack("<BHB", 0x05, self.delay, self.transparent)
+        data += b"\x00,"
+        data += struct.pack("<HHHHB", offset[0], offset[1], width, height, 0)
+        data += bytes([self.bits])
+        data += Image.fromarray(indices, "P").tobytes("gif", "P", self.bits, 0)
+        return data + b"\x00"
+
+    def close(self):
+        """Finish the gif, after all frames have been added.
+        """
+        if self.fh.closed:
+            return
+        if self.shape is None:
+            self.fh.close()
+            sys.exit("No frames were added to %s." % self.filename)
+        self.fh.write(b";")
+        self.fh.close()
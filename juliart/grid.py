@@ -0,0 +1,130 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from collections import OrderedDict
+import numpy
+
+
+def extent(resolution, zoom):
+    """Return the half width and half height of the grid for a resolution
+       (width, height) and zoom. The zoom is half of the shorter side, so a
+       square image covers [-zoom, zoom] in both directions, and a wider (or
+       taller) image shows more of the plane instead of stretching it.
+    """
+    shortest = float(min(resolution))
+    return zoom * (resolution[0] / shortest), zoom * (resolution[1] / shortest)
+
+
+def subsample_offsets(supersample):
+    """Return supersample evenly spaced offsets across a pixel (a fraction of
+       its width, centered on 0). The second half is exactly the negative of
+       the first, so the subsamples of mirrored pixels are mirrored too.
+    """
+    offsets = (numpy.arange(supersample) + 0.5) / supersample - 0.5
+    offsets[supersample - supersample // 2 :] = -offsets[: supersample // 2][::-1]
+    return offsets
+
+
+def coordinates(resolution, zoom, supersample=1, legacy=False):
+    """Return the real (x, columns) and imaginary (y, rows) coordinates of the
+       pixels for a resolution (width, height) and zoom, where the grid covers
+       [-zoom, zoom] along the shorter side (see extent), centered on the
+       origin. This is the same arithmetic as JuliaSet.translate, except that
+       the mirror of each pixel (see render.is_symmetric) is exactly its
+       negative, where the arithmetic can be a unit in the last place off.
+       With legacy (e.g., for the legacy bailout) we don't correct it, to
+       reproduce older images exactly. With supersample N, we return N evenly
+       spaced coordinates across each pixel (centered on the pixel's own
+       coordinate) instead.
+    """
+    zoom_x, zoom_y = extent(resolution, zoom)
+    offsets = subsample_offsets(supersample)
+    xs = (numpy.arange(resolution[0])[:, None] + offsets).ravel()
+    ys = (numpy.arange(resolution[1])[:, None] + offsets).ravel()
+    xs = -zoom_x + (xs / float(resolution[0]) * (zoom_x + zoom_x))
+    ys = -zoom_y + (ys / float(resolution[1]) * (zoom_y + zoom_y))
+    if not legacy:
+
+        # The first pixel has no mirror, and the rest mirror each other
+        for values in [xs[supersample:], ys[supersample:]]:
+            count = len(values) // 2
+            values[len(values) - count :] = -values[:count][::-1]
+    return xs, ys
+
+
+def meshgrid(resolution, zoom, legacy=False):
+    """Return the coordinate grid (za, zb) for a resolution and zoom, with rows
+       as y and columns as x (the same as the image).
+    """
+    return numpy.meshgrid(*coordinates(resolution, zoom, legacy=legacy))
+
+
+class GridCache:
+    """A GridCache keeps coordinate grids keyed by (resolution, zoom), so that
+       renders with the same resolution and zoom (e.g., the frames of an
+       animation) don't recompute them. The least recently used grids are
+       evicted when the total size goes over max_bytes, and a grid that is
+       larger than max_bytes on its own is returned without being kept.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.grids = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "[grid-cache][grids:%s][bytes:%s][hits:%s][misses:%s]" % (
+            len(self.grids),
+            self.nbytes,
+            self.hits,
+            self.misses,
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.grids)
+
+    def get(self, resolution, zoom, legacy=False):
+        """Get the coordinate grid (za, zb) for a resolution and zoom (see
+           meshgrid), creating it if we don't have it yet. The arrays are read
+           only, since they are shared between renders.
+        """
+        key = (tuple(resolution), float(zoom), legacy)
+        if key in self.grids:
+            self.hits += 1
+            self.grids.move_to_end(key)
+            return self.grids[key]
+
+        self.misses += 1
+        grid = meshgrid(resolution, zoom, legacy)
+        for array in grid:
+            array.setflags(write=False)
+
+        size = sum(array.nbytes for array in grid)
+        if size <= self.max_bytes:
+            self.grids[key] = grid
+            self.nbytes += size
+            self.evict()
+        return grid
+
+    def evict(self):
+        """Remove least recently used grids until we are under max_bytes.
+        """
+        while self.nbytes > self.max_bytes and self.grids:
+            _, grid = self.grids.popitem(last=False)
+            self.nbytes -= sum(array.nbytes for array in grid)
+
+    def clear(self):
+        self.grids.clear()
+        self.nbytes = 0
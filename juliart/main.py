@@ -10,13 +10,35 @@ Modified from https://github.com/Visual-mov/Colorful-Julia (MIT License)
 
 """
 
-from .colors import get_theme_colors
+from .colors import apply_palette, get_theme_colors, palette_colors
+from .engines import bailouts, smooth_radius
+from .frames import FrameStore
+from .gif import GIFWriter
+from .grid import GridCache, coordinates, meshgrid
 from .namer import RobotNamer
-from .utils import check_restricted, get_font
-from PIL import Image, ImageDraw, ImageFont
+from .png import PNGWriter
+from .render import (
+    count_dtype,
+    render_counts,
+    render_edges,
+    render_strips,
+    render_supersampled,
+    render_unknown,
+    resample_counts,
+)
+from .utils import check_restricted, load_font, parse_center
+from .video import VideoWriter, codecs
+from PIL import Image, ImageDraw
 from random import randint, uniform, choice
-
-from math import sqrt
+from functools import partial
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, localcontext
+from math import log10
+import itertools
+import json
+import numpy
 import os
 import shutil
 import sys
@@ -44,6 +66,15 @@ class JuliaSetAnimation:
         cleanup=True,
         zoom_max=3,
         zoom_min=0,
+        engine="numpy",
+        workers=1,
+        symmetric=True,
+        method="brute",
+        cache=None,
+        palette=None,
+        center=None,
+        width=None,
+        height=None,
     ):
 
         # Set initial values to randomize across
@@ -60,10 +91,22 @@ class JuliaSetAnimation:
         self.cleanup = cleanup
 
         self.resolution = resolution
+        self.width = width
+        self.height = height
+        self.center = center
         self.color = color
         self.theme = theme
         self.iterations = iterations
         self.rgb = rgb
+        self.engine = engine
+        self.workers = workers
+        self.symmetric = symmetric
+        self.method = method
+        self.cache = cache
+        self.palette = palette
+
+        # Frames with the same resolution and zoom share coordinate grids
+        self.grid_cache = GridCache()
 
     def __str__(self):
         return "[juliaset-animation][resolution:%s][color:%s][iterations:%s]" % (
@@ -104,6 +147,118 @@ class JuliaSetAnimation:
 
         return rangex
 
+    def interpolate_keyframes(self, keyframes, frames, zoom=1.8):
+        """Given a list of keyframes (dictionaries with any of center, zoom, ca
+           and cb) return the center, zoom, ca and cb for each frame, moving
+           from each keyframe to the next with keyframes spread evenly across
+           the frames. The zoom is interpolated exponentially, so every frame
+           zooms by the same factor, and the center moves in proportion to the
+           zoom, so it moves about the same number of pixels every frame. The
+           c parameters move linearly. A value that a keyframe doesn't have is
+           the same as the keyframe before it (or the animation's center, zoom,
+           ca and cb, for the first).
+        """
+        if len(keyframes) < 2:
+            sys.exit("An animation needs at least two keyframes.")
+        if frames < 2:
+            sys.exit("An animation with keyframes needs at least two frames.")
+
+        values = []
+        last = {"center": self.center, "zoom": zoom, "ca": self.ca, "cb": self.cb}
+        for keyframe in keyframes:
+            unknown = set(keyframe) - set(last)
+            if unknown:
+                sys.exit("Unknown keyframe parameters: %s" % ", ".join(sorted(unknown)))
+            value = dict(last, **keyframe)
+            value["center"] = parse_center(value["center"]) or (Decimal(0), Decimal(0))
+            value["zoom"] = float(value["zoom"])
+            if value["zoom"] <= 0:
+                sys.exit("Keyframe zoom must be greater than 0.")
+            for param in ["ca", "cb"]:
+                value[param] = float(value[param])
+                check_restricted(value[param], -1.0, 1.0)
+            values.append(value)
+            last = value
+
+        # Centers need enough digits for the deepest zoom (see engines.py)
+        smallest = min(value["zoom"] for value in values)
+        segments = len(values) - 1
+        result = []
+        with localcontext() as context:
+            context.prec = max(28, int(-log10(smallest)) + 30)
+            for index in range(frames):
+                position = index * segments / float(frames - 1)
+                segment = min(int(position), segments - 1)
+                start, end = values[segment], values[segment + 1]
+                step = position - segment
+
+                # The fraction of the way that the center has left to go
+                ratio = end["zoom"] / start["zoom"]
+                if abs(ratio - 1) < 1e-12:
+                    left = 1 - step
+                else:
+                    left = (ratio ** step - ratio) / (1 - ratio)
+
+                result.append(
+                    {
+                        "center": tuple(
+                            b - (b - a) * Decimal(left)
+                            for a, b in zip(start["center"], end["center"])
+                        ),
+                        "zoom": start["zoom"] * ratio ** step,
+                        "ca": start["ca"] + (end["ca"] - start["ca"]) * step,
+                        "cb": start["cb"] + (end["cb"] - start["cb"]) * step,
+                    }
+                )
+        return result
+
+    def render_keyframes(self, params, reuse=True):
+        """Given a list of frame parameters, yield each rendered frame in order.
+           Frames are rendered one at a time (each with all of the workers) so
+           that each can reuse the counts of the frame before it, which for a
+           zoom is most of them (see JuliaSet.reuse_counts).
+        """
+        previous = None
+        reused = total = 0
+        for frame in params:
+            juliaset = build_frame(frame, self.grid_cache, previous)
+            reused += juliaset.reused
+            total += juliaset.res[0] * juliaset.res[1]
+            if reuse:
+                previous = juliaset
+            yield numpy.asarray(juliaset.image)
+        if reuse and total:
+            print("Reused counts for %.1f%% of pixels" % (100.0 * reused / total))
+
+    def render_frames(self, params):
+        """Given a list of frame parameters, yield each rendered frame in order.
+           With more than one worker, frames are rendered in a process pool and
+           each is yielded as soon as it (and all frames before it) are done.
+           We only keep a few frames per worker in flight at once.
+        """
+        workers = self.workers
+        if workers is None or workers < 1:
+            workers = os.cpu_count() or 1
+
+        if workers == 1:
+            for frame in params:
+                yield render_frame(frame, self.grid_cache)
+            return
+
+        # Each worker process keeps its own grid cache across frames
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_frame_worker
+        ) as executor:
+            pending = deque()
+            frames = iter(params)
+            for frame in itertools.islice(frames, workers * 2):
+                pending.append(executor.submit(render_frame, frame))
+            while pending:
+                result = pending.popleft().result()
+                for frame in itertools.islice(frames, 1):
+                    pending.append(executor.submit(render_frame, frame))
+                yield result
+
     def generate_animation(
         self,
         iterations=None,
@@ -119,46 +274,72 @@ class JuliaSetAnimation:
         font="OpenSans-Regular.ttf",
         xcoord=10,
         ycoord=10,
+        periodicity=None,
+        bailout="squared",
+        supersample=1,
+        supersample_edges=False,
+        keyframes=None,
+        reuse=True,
+        fps=10,
+        gif_colors=255,
     ):
         """Generate the image. If iterations is not provided, we use the default
 
            Parameters
            ==========
            iterations: iterations per pixel.
+           periodicity: a tolerance to detect points caught in a cycle (interior)
+           bailout: squared (the default) or legacy to reproduce older images
+           supersample: anti-alias by averaging N x N colors for each pixel
+           supersample_edges: only supersample pixels that differ from a neighbor
+           keyframes: move between keyframes instead (see interpolate_keyframes)
+           reuse: with keyframes, reuse counts from the frame before
+           fps: frames per second
+           gif_colors: the most colors in a gif (at most 255, fewer are smaller)
         """
         if not iterations:
             iterations = self.iterations
 
-        try:
-            import imageio
-        except:
-            sys.exit("imageio is required to animate. pip install juliart[animate]")
-
         # Calculate ranges to iterate across based on frames
         rangea = [self.ca] * frames
         rangeb = [self.cb] * frames
         zooms = [zoom] * frames
+        centers = [self.center] * frames
+
+        # Keyframes determine every value, otherwise vary argument only if desired
+        if keyframes:
+            values = self.interpolate_keyframes(keyframes, frames, zoom)
+            rangea = [value["ca"] for value in values]
+            rangeb = [value["cb"] for value in values]
+            zooms = [value["zoom"] for value in values]
+            centers = [value["center"] for value in values]
+        else:
+            if randomize_a:
+                rangea = self.calculate_range(self.ca, frames)
+            if randomize_b:
+                rangeb = self.calculate_range(self.cb, frames)
+            if randomize_zoom:
+                zooms = self.calculate_range(
+                    self.zoom,
+                    frames,
+                    left_bound=self.zoom_min,
+                    right_bound=self.zoom_max,
+                )
 
-        # Vary argument only if desired
-        if randomize_a:
-            rangea = self.calculate_range(self.ca, frames)
-        if randomize_b:
-            rangeb = self.calculate_range(self.cb, frames)
-        if randomize_zoom:
-            zooms = self.calculate_range(
-                self.zoom, frames, left_bound=self.zoom_min, right_bound=self.zoom_max
-            )
-
-        # Set the colorbias and glow
+        # Set the colorbias and glow, and the palette shared by all frames
         juliaset = JuliaSet(
             resolution=self.resolution,
             color=self.color,
             iterations=self.iterations,
             theme=self.theme,
             rgb=self.rgb,
+            engine=self.engine,
         )
         colorbias = juliaset.colorbias
         glow = juliaset.glow
+        palette = self.palette
+        if palette is None:
+            palette = juliaset.build_palette(self.iterations)
         prefix = juliaset.generate_name()
 
         # Create temporary directory to work in
@@ -167,51 +348,83 @@ class JuliaSetAnimation:
         if not outfile:
             outfile = "%s.gif" % prefix
 
-        # Output file must be a gif
-        if not outfile.endswith(".gif"):
+        # Output file must be a gif, or a video (mp4 or webm)
+        extension = os.path.splitext(outfile)[1].lower()
+        if extension not in [".gif"] + list(codecs):
             outfile = "%s.gif" % os.path.splitext(outfile)[0]
+            extension = ".gif"
 
-        print("Generating Julia Set Animation...")
-
-        # Keep list of images, we will add them in reverse to loop the animation
-        images = []
-
-        # Go through each frame to generate julia set, write animation as we go
-        with imageio.get_writer(outfile, mode="I") as writer:
-            for i in range(frames):
-                juliaset = JuliaSet(
-                    resolution=self.resolution,
-                    iterations=self.iterations,
-                    quiet=True,
-                    ca=rangea[i],
-                    cb=rangeb[i],
-                )
+        # Videos are encoded by ffmpeg. A gif has one palette, from the colors
+        # that the frames can have (see gif.py)
+        if extension in codecs:
+            writer = VideoWriter(outfile, fps=fps)
+        else:
+            colors = palette_colors(palette, self.iterations, self.color == "smooth")
+            writer = GIFWriter(outfile, colors, fps=fps, max_colors=gif_colors)
 
-                # Set pre-determined color and parameter values
-                juliaset.colorbias = colorbias
-                juliaset.glow = glow
-                juliaset.generate_image(zoom=zooms[i])
-
-                # Do we want to add text?
-                juliaset.write_text(
-                    text,
-                    fontsize=fontsize,
-                    xcoord=xcoord,
-                    ycoord=ycoord,
-                    font=font,
-                    rgb=(255, 255, 255, fontalpha),
-                )
+        print("Generating Julia Set Animation...")
 
-                # We could easily hand the image data to writer, but this preserves frames if desired
-                pngfile = os.path.join(tmpdir, "%s-%s.png" % (prefix, i))
-                images.append(pngfile)
-                juliaset.save_image(pngfile)
-                writer.append_data(imageio.imread(pngfile))
+        # Keep frames in a memory-mapped store, we add them in reverse to loop
+        store = FrameStore(os.path.join(tmpdir, "%s.frames" % prefix), frames)
+
+        # Each frame is independent once the ranges and colors are set
+        params = [
+            {
+                "juliaset": {
+                    "resolution": self.resolution,
+                    "width": self.width,
+                    "height": self.height,
+                    "center": centers[i],
+                    "color": self.color,
+                    "iterations": self.iterations,
+                    "quiet": True,
+                    "ca": rangea[i],
+                    "cb": rangeb[i],
+                    "engine": self.engine,
+                    "workers": self.workers if keyframes else 1,
+                    "symmetric": self.symmetric,
+                    "method": self.method,
+                    "cache": self.cache,
+                    "palette": palette,
+                },
+                "colorbias": colorbias,
+                "glow": glow,
+                "image": {
+                    "zoom": zooms[i],
+                    "periodicity": periodicity,
+                    "bailout": bailout,
+                    "supersample": supersample,
+                    "supersample_edges": supersample_edges,
+                },
+                "text": {
+                    "text": text,
+                    "fontsize": fontsize,
+                    "xcoord": xcoord,
+                    "ycoord": ycoord,
+                    "font": font,
+                    "rgb": (255, 255, 255, fontalpha),
+                },
+                "pngfile": None
+                if self.cleanup
+                else os.path.join(tmpdir, "%s-%s.png" % (prefix, i)),
+            }
+            for i in range(frames)
+        ]
+
+        # Write animation as we go, frames are returned in order
+        if keyframes:
+            rendered = self.render_keyframes(params, reuse)
+        else:
+            rendered = self.render_frames(params)
+        with writer:
+            for frame in rendered:
+                store.append(frame)
+                writer.append_data(frame)
 
             # Now add the images back (in reverse) to create loop
-            while images:
-                pngfile = images.pop()
-                writer.append_data(imageio.imread(pngfile))
+            for frame in store.reverse():
+                writer.append_data(frame)
+        store.close()
 
         if self.cleanup:
             print("Cleaning up %s" % tmpdir)
@@ -238,19 +451,44 @@ class JuliaSet:
         quiet=False,
         ca=None,
         cb=None,
+        engine="numpy",
+        workers=1,
+        grid_cache=None,
+        symmetric=True,
+        method="brute",
+        cache=None,
+        palette=None,
+        center=None,
+        width=None,
+        height=None,
     ):
         # Check that values are valid
         self.ca = ca or uniform(-1, 1)
         self.cb = cb or uniform(-1, 1)
         self.check_cparams()
+        self.center = parse_center(center)
 
+        # The image is square (resolution) unless a width or height is given
         self.quiet = quiet
-        self.res = (resolution, resolution)
+        self.res = (width or resolution, height or resolution)
         self.color = color
         self.theme = theme
         self.iterations = iterations
-        self.image = Image.new("RGBA", self.res)
-        self.draw = ImageDraw.Draw(self.image)
+        self.engine = engine
+        self.workers = workers
+        self.grid_cache = grid_cache
+        self.symmetric = symmetric
+        self.method = method
+        self.cache = cache
+        self.palette = palette
+        self.counts = None
+        self.counts_params = {}
+        self.counts_options = {}
+        self.reused = 0
+
+        # The image is created when it's generated (it might be streamed)
+        self.image = None
+        self.draw = None
         self.generate_colors(rgb)
 
     def check_cparams(self, min_range=-1.0, max_range=1.0):
@@ -295,46 +533,405 @@ class JuliaSet:
         if not self.quiet:
             print(message)
 
-    def generate_image(self, iterations=None, zoom=1.8, radius=4):
-        """Generate the image. If iterations is not provided, we use the default
+    def generate_image(
+        self,
+        iterations=None,
+        zoom=1.8,
+        radius=None,
+        periodicity=None,
+        bailout="squared",
+        supersample=1,
+        supersample_edges=False,
+        previous=None,
+    ):
+        """Generate the image. If iterations is not provided, we use the default.
+           This computes the escape time counts (see compute_counts) and then
+           colors them (see apply_colors).
 
            Parameters
            ==========
            iterations: iterations per pixel.
+           radius: the escape radius (defaults to 2, 4 for the legacy bailout, or 16 for smooth)
+           periodicity: a tolerance to detect points caught in a cycle (interior)
+           bailout: squared (the default) or legacy to reproduce older images
+           supersample: anti-alias by averaging N x N colors for each pixel
+           supersample_edges: only supersample pixels that differ from a neighbor
+           previous: a JuliaSet with counts to reuse (see reuse_counts)
         """
         if not iterations:
             iterations = self.iterations
 
         self.print("Generating Julia Set...")
+        if supersample > 1 and supersample_edges:
+            counts = self.compute_counts(
+                iterations=iterations,
+                zoom=zoom,
+                radius=radius,
+                periodicity=periodicity,
+                bailout=bailout,
+                previous=previous,
+            )
+            return self.apply_colors_edges(counts, iterations, supersample)
+
+        if supersample > 1:
+            return self.generate_supersampled(
+                iterations=iterations,
+                zoom=zoom,
+                radius=radius,
+                periodicity=periodicity,
+                bailout=bailout,
+                supersample=supersample,
+            )
+
+        counts = self.compute_counts(
+            iterations=iterations,
+            zoom=zoom,
+            radius=radius,
+            periodicity=periodicity,
+            bailout=bailout,
+            previous=previous,
+        )
+        self.apply_colors(counts, iterations)
+
+    def generate_supersampled(
+        self,
+        iterations=None,
+        zoom=1.8,
+        radius=None,
+        periodicity=None,
+        bailout="squared",
+        supersample=2,
+    ):
+        """Generate an anti-aliased image, where each pixel is the average color
+           of supersample x supersample subsamples. Subsamples are rendered and
+           colored in bands of rows (see render.render_supersampled), so they
+           are never all kept at once. Since there are no counts for each pixel,
+           self.counts is unset.
+        """
+        if not iterations:
+            iterations = self.iterations
+        options = self.get_options(iterations, radius, periodicity, bailout)
+
+        # The palette is built once, and shared by all workers
+        palette = self.palette
+        if palette is None:
+            palette = self.build_palette(iterations)
+
+        xs, ys = self.locate(
+            *coordinates(self.res, zoom, supersample, bailout == "legacy")
+        )
+        image = render_supersampled(
+            xs,
+            ys,
+            self.ca,
+            self.cb,
+            partial(apply_palette, palette=palette, iterations=iterations),
+            supersample=supersample,
+            symmetric=self.symmetric and self.center is None,
+            engine=self.engine,
+            workers=self.workers,
+            method=self.method,
+            **options
+        )
+        self.counts = None
+        self.counts_params = {}
+        self.counts_options = {}
+        self.image = Image.fromarray(image)
+        self.draw = ImageDraw.Draw(self.image)
+        return self.image
+
+    def generate_stream(
+        self,
+        outfile=None,
+        iterations=None,
+        zoom=1.8,
+        radius=None,
+        periodicity=None,
+        bailout="squared",
+        supersample=1,
+        rows=None,
+        text=None,
+        fontsize=16,
+        rgb=(255, 255, 255),
+        xcoord=10,
+        ycoord=10,
+        font="OpenSans-Regular.ttf",
+    ):
+        """Generate the image one strip of rows at a time, and write each strip
+           straight to a png file (see png.PNGWriter), so that the full image
+           (e.g., for --res 40000) is never held in memory. Text (see
+           write_text) is drawn onto the strips that it overlaps. The image
+           and counts are not kept, and we return the output file name.
+
+           Parameters
+           ==========
+           outfile: the png file to write (defaults to a random name)
+           rows: the number of rows per strip (defaults to about a megapixel)
+           supersample: anti-alias by averaging N x N colors for each pixel
+        """
+        if not iterations:
+            iterations = self.iterations
+        if not outfile:
+            outfile = "%s.png" % self.generate_name()
+        options = self.get_options(iterations, radius, periodicity, bailout)
+
+        lines = []
+        if text not in [None, ""]:
+            font = load_font(font, fontsize)
+            lines = self.layout_text(text, font, xcoord, ycoord)
+
+        # The palette is built once, and shared by all strips
+        palette = self.palette
+        if palette is None:
+            palette = self.build_palette(iterations)
 
-        # Iterating through pixels in the image (the resolution)
-        # See https://en.wikipedia.org/wiki/Julia_set#Pseudocode and
-        for x in range(self.res[0]):  # real axis
-            for y in range(self.res[1]):  # imaginary axis
-
-                # Scaled x and y coordinate of pixels
-                za = self.translate(x, 0, self.res[0], -zoom, zoom)
-                zb = self.translate(y, 0, self.res[1], -zoom, zoom)
-                i = 0
-
-                # iterations are the number of recursions of the formula we want to do
-                # we consider za the real component, and zb the imaginary component
-                # see https://www.youtube.com/watch?v=fAsaSkmbF5s for how equations derived
-                while i < iterations:
-                    tmp = 2 * za * zb
-                    za = za * za - zb * zb + self.ca
-                    zb = tmp + self.cb
-                    if sqrt(za * za + zb * zb) > radius:
-                        break
-                    i += 1
-
-                # When we get here, we have a value of i (when the loop broke)
-                # if i isn't the max iterations, we color it. Otherwise, it's black
-                self.draw.point(
-                    (x, y),
-                    self.colorize(i, iterations) if i != iterations else (0, 0, 0),
+        width, height = self.res
+        xs, ys = self.locate(
+            *coordinates(self.res, zoom, supersample, bailout == "legacy")
+        )
+        self.print("Generating Julia Set (streaming to %s)..." % outfile)
+        with PNGWriter(outfile, width, height) as writer:
+            for start, colors in render_strips(
+                xs,
+                ys,
+                self.ca,
+                self.cb,
+                partial(apply_palette, palette=palette, iterations=iterations),
+                rows=rows,
+                workers=self.workers,
+                supersample=supersample,
+                engine=self.engine,
+                method=self.method,
+                **options
+            ):
+                stop = start + len(colors)
+                overlaps = [
+                    line
+                    for line in lines
+                    if line[1] - line[2] < stop and line[1] + 2 * line[2] > start
+                ]
+                if overlaps:
+                    strip = Image.fromarray(colors)
+                    strip = self.draw_text(strip, overlaps, font, rgb, offset=start)
+                    colors = numpy.asarray(strip)
+                writer.write(colors)
+                self.print(
+                    "Rendered rows %s-%s of %s (%.1f%%)"
+                    % (start, stop - 1, height, 100.0 * stop / height)
                 )
 
+        self.counts = None
+        self.counts_params = {}
+        self.counts_options = {}
+        return outfile
+
+    def get_options(self, iterations, radius=None, periodicity=None, bailout="squared"):
+        """Return the escape time engine options (see engines.py) for a render.
+        """
+        if radius is None:
+            radius = smooth_radius if self.color == "smooth" else bailouts[bailout]
+        options = {
+            "iterations": iterations,
+            "radius": radius,
+            "periodicity": periodicity,
+            "bailout": bailout,
+        }
+        if self.color == "smooth":
+            options["smooth"] = True
+        if self.center and self.engine == "perturbation":
+            options["center"] = self.center
+        return options
+
+    def locate(self, za, zb):
+        """Coordinates are offsets from the center of the image. For a center
+           other than the origin we add it, except for the perturbation engine,
+           which takes the offsets and the center itself (see get_options).
+        """
+        if self.center is None or self.engine == "perturbation":
+            return za, zb
+        return za + float(self.center[0]), zb + float(self.center[1])
+
+    def compute_counts(
+        self,
+        iterations=None,
+        zoom=1.8,
+        radius=None,
+        periodicity=None,
+        bailout="squared",
+        previous=None,
+    ):
+        """Compute the escape time counts (the iteration when each pixel escaped,
+           or iterations if it never did) and return them as a compact array
+           (uint16, unless there are more than 65535 iterations). Rows of the
+           counts are y, and columns are x (the same as the image). The counts
+           are also kept as self.counts to save (see save_counts). For the
+           smooth color, counts are continuous (float32) instead. With a
+           previous JuliaSet (e.g., the last frame of an animation) we reuse
+           its counts where we can (see reuse_counts).
+        """
+        if not iterations:
+            iterations = self.iterations
+        smooth = self.color == "smooth"
+        options = self.get_options(iterations, radius, periodicity, bailout)
+
+        # Counts don't depend on color, so a cached render can be re-colored
+        counts = None
+        if self.cache is not None:
+            params = dict(options, center=self.center) if self.center else options
+            key = self.cache.key(
+                ca=self.ca,
+                cb=self.cb,
+                zoom=zoom,
+                resolution=self.res,
+                method=self.method,
+                engine=self.engine,
+                **params
+            )
+            counts = self.cache.get(key)
+
+        if counts is None:
+
+            # Scaled x (real axis) and y (imaginary axis) coordinates of pixels
+            # See https://en.wikipedia.org/wiki/Julia_set#Pseudocode and
+            legacy = bailout == "legacy"
+            if self.grid_cache is not None:
+                za, zb = self.locate(*self.grid_cache.get(self.res, zoom, legacy))
+            else:
+                za, zb = self.locate(*meshgrid(self.res, zoom, legacy))
+
+            # Reused counts are close, but not exact, so they aren't cached
+            counts = self.reuse_counts(previous, za, zb, zoom, options)
+            if counts is None:
+                counts = render_counts(
+                    za,
+                    zb,
+                    self.ca,
+                    self.cb,
+                    engine=self.engine,
+                    workers=self.workers,
+                    symmetric=self.symmetric and self.center is None,
+                    method=self.method,
+                    **options
+                ).astype(count_dtype(iterations, smooth))
+
+                if self.cache is not None:
+                    self.cache.put(key, counts)
+
+        self.counts = counts
+        self.counts_params = {"iterations": iterations, "zoom": zoom}
+        self.counts_options = options
+        return counts
+
+    def reuse_counts(self, previous, za, zb, zoom, options):
+        """Compute counts for a grid (za, zb) by reusing the counts of a previous
+           JuliaSet where its viewport overlaps ours, e.g., from one frame of a
+           zoom to the next. Counts are resampled onto our pixels, and only the
+           pixels that are newly exposed or near an edge are rendered (see
+           render.resample_counts). We return None if there is nothing to
+           reuse, or the previous counts are for a different c or options.
+           The number of pixels that were reused is kept as self.reused.
+        """
+        if previous is None or previous.counts is None:
+            return None
+        if (previous.ca, previous.cb) != (self.ca, self.cb):
+            return None
+        if dict(previous.counts_options, center=None) != dict(options, center=None):
+            return None
+
+        # Both grids are compared as offsets from our center
+        ours = self.center or (0, 0)
+        theirs = previous.center or (0, 0)
+        shift_x, shift_y = float(theirs[0] - ours[0]), float(theirs[1] - ours[1])
+        xs, ys = coordinates(self.res, zoom)
+        previous_xs, previous_ys = coordinates(
+            previous.res, previous.counts_params["zoom"]
+        )
+        counts, known = resample_counts(
+            previous.counts, xs, ys, previous_xs + shift_x, previous_ys + shift_y
+        )
+        render_unknown(
+            za,
+            zb,
+            self.ca,
+            self.cb,
+            counts,
+            known,
+            engine=self.engine,
+            workers=self.workers,
+            symmetric=self.symmetric and self.center is None,
+            **options
+        )
+        self.reused = int(known.sum())
+        return counts
+
+    def apply_colors(self, counts=None, iterations=None):
+        """Color an array of counts (defaults to self.counts) and write them
+           to the image in one call. Iterations must be the same as for
+           compute_counts, since counts of iterations are colored black.
+        """
+        if counts is None:
+            counts = self.counts
+            iterations = iterations or self.counts_params.get("iterations")
+        if not iterations:
+            iterations = self.iterations
+        self.image = Image.fromarray(self.colorize(counts, iterations))
+        self.draw = ImageDraw.Draw(self.image)
+        return self.image
+
+    def apply_colors_edges(self, counts=None, iterations=None, supersample=2):
+        """Color an array of counts (see apply_colors) and then anti-alias the
+           pixels along edges, where a color or count differs from a neighbor,
+           with supersample x supersample subsamples (see render.render_edges).
+           The counts must be from compute_counts, since we need the zoom and
+           options that they were rendered with.
+        """
+        if counts is None:
+            counts = self.counts
+        if not iterations:
+            iterations = self.counts_params.get("iterations") or self.iterations
+        zoom = self.counts_params.get("zoom", 1.8)
+        options = self.counts_options
+
+        colors = self.colorize(counts, iterations)
+        legacy = options.get("bailout") == "legacy"
+        if self.grid_cache is not None:
+            za, zb = self.locate(*self.grid_cache.get(self.res, zoom, legacy))
+        else:
+            za, zb = self.locate(*meshgrid(self.res, zoom, legacy))
+        edges = render_edges(
+            za,
+            zb,
+            self.ca,
+            self.cb,
+            colors,
+            lambda values: self.colorize(values, iterations),
+            counts=counts,
+            supersample=supersample,
+            symmetric=self.symmetric and self.center is None,
+            engine=self.engine,
+            **options
+        )
+        self.print("Supersampled %s edge pixels" % edges)
+        self.image = Image.fromarray(colors)
+        self.draw = ImageDraw.Draw(self.image)
+        return self.image
+
+    def save_counts(self, outfile=None):
+        """Save the counts from compute_counts, along with the parameters used
+           to generate them, to a compressed numpy file (.npz) that can be
+           re-colored later (see read_counts).
+        """
+        if self.counts is None:
+            sys.exit("There are no counts to save, run compute_counts first.")
+        if not outfile:
+            outfile = "%s.npz" % self.generate_name()
+        self.print("Saving counts to %s" % outfile)
+        with open(outfile, "wb") as fh:
+            numpy.savez_compressed(
+                fh, counts=self.counts, ca=self.ca, cb=self.cb, **self.counts_params
+            )
+        return outfile
+
     def write_text(
         self,
         text,
@@ -348,53 +945,69 @@ class JuliaSet:
            onto the image. The default font provided with the package 
         """
         if text not in [None, ""]:
-            import textwrap
-
-            # Break image into width and height
-            width, height = self.res
-            fontfile = get_font(font)
-            font = ImageFont.truetype(fontfile, fontsize)
-            lines = textwrap.wrap(text)
-
-            draw = self.draw
-            image = self.image
-
-            # If the user provides a transparency value, we need to write font to separate layer
-            if len(rgb) > 3:
-                text = Image.new("RGBA", self.image.size, (255, 255, 255, 0))
-                draw = ImageDraw.Draw(text)
-
-            # Keep track of y coordinate (height)
-            total_height = ycoord
-            for line in lines:
-
-                # Calculate a specific width and height for the line
-                w, h = font.getsize(line)
-
-                # If we have space, honor the x coordinate, otherwise center
-                xstart = (width - w) / 2
-                if width - xcoord > w:
-                    xstart = xcoord
-
-                # Don't draw if we go over total height
-                if total_height >= height:
-                    break
-                draw.text((xstart, total_height), line, font=font, fill=rgb)
-                total_height += h
-
-            if len(rgb) > 3:
-                self.image = Image.alpha_composite(self.image, text)
-            else:
-                self.image = image
-                self.draw = draw
+            if self.image is None:
+                sys.exit("There is no image to write text to, generate one first.")
+            font = load_font(font, fontsize)
+            lines = self.layout_text(text, font, xcoord, ycoord)
+            self.image = self.draw_text(self.image, lines, font, rgb)
+            self.draw = ImageDraw.Draw(self.image)
+
+    def layout_text(self, text, font, xcoord=10, ycoord=10):
+        """Break text into lines for the width of the image, and return a list
+           of (x, y, height, line) for each line that fits.
+        """
+        import textwrap
+
+        # Break image into width and height
+        width, height = self.res
+        lines = []
+
+        # Keep track of y coordinate (height)
+        total_height = ycoord
+        for line in textwrap.wrap(text):
+
+            # Calculate a specific width and height for the line
+            w, h = font.getsize(line)
+
+            # If we have space, honor the x coordinate, otherwise center
+            xstart = (width - w) / 2
+            if width - xcoord > w:
+                xstart = xcoord
+
+            # Don't draw if we go over total height
+            if total_height >= height:
+                break
+            lines.append((xstart, total_height, h, line))
+            total_height += h
+        return lines
+
+    def draw_text(self, image, lines, font, rgb=(255, 255, 255), offset=0):
+        """Draw lines of text (see layout_text) onto an image, and return it.
+           If the image is a strip of rows, offset is the row that it starts at.
+        """
+        draw = ImageDraw.Draw(image)
+
+        # If the user provides a transparency value, we need to write font to separate layer
+        if len(rgb) > 3:
+            layer = Image.new("RGBA", image.size, (255, 255, 255, 0))
+            draw = ImageDraw.Draw(layer)
+
+        for xstart, ystart, _, line in lines:
+            draw.text((xstart, ystart - offset), line, font=font, fill=rgb)
+
+        if len(rgb) > 3:
+            image = Image.alpha_composite(image, layer)
+        return image
 
     def save_image(self, outfile=None):
         """Save the image to an output file, if provided. Optionally add some
            text to it.
         """
+        if self.image is None:
+            sys.exit("There is no image to save, generate one first.")
         if not outfile:
             outfile = "%s.png" % self.generate_name()
-        print("Saving image to %s" % outfile)
+        self.print("Saving image to %s" % outfile)
         self.image.save(outfile, "PNG")
 
     def generate_name(self):
@@ -402,32 +1015,135 @@ class JuliaSet:
         """
         return RobotNamer().generate()
 
-    def colorize(self, i, iterations=None):
-        """Based on the user selection, save with a pattern, random, or glowing color
+    def build_palette(self, iterations=None):
+        """Based on the user selection, build a palette (a lookup table) with
+           one RGBA color for each count (the value of i when the loop broke)
+           from 0 through iterations, for a pattern, random, or glowing color.
+           The last entry (counts that reached the max iterations) is black.
+           Colors are clipped to 0-255 the same as Pillow would.
         """
         if not iterations:
             iterations = self.iterations
+        counts = numpy.arange(iterations + 1)
 
         if self.color == "random":
-            c = int(self.translate(i, 0, iterations, 0, 255) * (i / 4))
-            return (c + self.colorbias[0], c + self.colorbias[1], c + self.colorbias[2])
+            c = self.translate(counts, 0, iterations, 0, 255) * (counts / 4)
+            colors = c.astype(numpy.int64)[..., None] + numpy.array(self.colorbias)
 
         elif self.color == "pattern":
-            if i % 2 == 0:
-                return self.colorbias
-            return (0, 0, 0)
+            colors = numpy.where(
+                (counts % 2 == 0)[..., None], numpy.array(self.colorbias), 0
+            )
 
         elif self.color == "glow":
-            return (i * self.glow[0], i * self.glow[1], i * self.glow[2])
+            colors = counts[..., None] * numpy.array(self.glow)
+
+        # A gradient from black to the colorbias, and then to white
+        elif self.color == "smooth":
+            t = numpy.sqrt(counts / iterations)[..., None] * 2
+            colorbias = numpy.array(self.colorbias)
+            colors = numpy.where(
+                t < 1, t * colorbias, colorbias + (t - 1) * (255 - colorbias)
+            )
 
         else:
-            print("Color choice %s is not valid." % self.color)
-            sys.exit(1)
+            sys.exit("Color choice %s is not valid." % self.color)
+
+        palette = numpy.zeros((iterations + 1, 4), dtype=numpy.uint8)
+        palette[:, :3] = numpy.clip(colors, 0, 255)
+        palette[iterations, :3] = 0
+        palette[:, 3] = 255
+        return palette
+
+    def colorize(self, counts, iterations=None):
+        """Color an array of counts by looking them up in the palette (see
+           colors.apply_palette), and return an array of RGBA values. We use
+           self.palette if it's set, otherwise we build one (see build_palette).
+        """
+        if not iterations:
+            iterations = self.iterations
+        palette = self.palette
+        if palette is None:
+            palette = self.build_palette(iterations)
+        return apply_palette(counts, palette, iterations)
 
     def rnd(self, a, b):
         return randint(a, b)
 
     def translate(self, value, leftMin, leftMax, rightMin, rightMax):
+        """Map a value (or numpy array of values) from the left range into
+           the right range.
+        """
         return rightMin + (
-            float(value - leftMin) / float(leftMax - leftMin) * (rightMax - rightMin)
+            numpy.asarray(value - leftMin, dtype=numpy.float64)
+            / float(leftMax - leftMin)
+            * (rightMax - rightMin)
         )
+
+
+# Coordinate grids shared by the frames rendered in a worker process
+_worker_grid_cache = None
+
+
+def _init_frame_worker():
+    global _worker_grid_cache
+    _worker_grid_cache = GridCache()
+
+
+def render_frame(params, grid_cache=None):
+    """Render a single animation frame from a dictionary of parameters (see
+       JuliaSetAnimation.generate_animation). This is a module level function
+       so that it can be run in a process pool worker. We return the frame
+       pixels, and only write a png file if one is provided (to keep it).
+    """
+    return numpy.asarray(build_frame(params, grid_cache).image)
+
+
+def build_frame(params, grid_cache=None, previous=None):
+    """Generate the JuliaSet for an animation frame (see render_frame), reusing
+       the counts of a previous frame if one is provided.
+    """
+    if grid_cache is None:
+        grid_cache = _worker_grid_cache
+    juliaset = JuliaSet(grid_cache=grid_cache, **params["juliaset"])
+
+    # Set pre-determined color and parameter values
+    juliaset.colorbias = params["colorbias"]
+    juliaset.glow = params["glow"]
+    juliaset.generate_image(previous=previous, **params["image"])
+
+    # Do we want to add text?
+    juliaset.write_text(**params["text"])
+    if params["pngfile"]:
+        juliaset.save_image(params["pngfile"])
+    return juliaset
+
+
+def read_keyframes(filename):
+    """Read keyframes for an animation from a json file, a list of objects with
+       any of center ("x,y"), zoom, ca and cb (see interpolate_keyframes).
+    """
+    if not os.path.exists(filename):
+        sys.exit("Keyframes file %s does not exist." % filename)
+    try:
+        with open(filename) as fd:
+            keyframes = json.load(fd)
+    except ValueError as exc:
+        sys.exit("Error reading keyframes %s: %s" % (filename, exc))
+    if not isinstance(keyframes, list) or not all(
+        isinstance(keyframe, dict) for keyframe in keyframes
+    ):
+        sys.exit("Keyframes must be a list of objects.")
+    return keyframes
+
+
+def read_counts(filename):
+    """Read counts saved with JuliaSet.save_counts, and return a dictionary with
+       the counts and the parameters used to generate them.
+    """
+    if not os.path.exists(filename):
+        sys.exit("Counts file %s does not exist." % filename)
+    with numpy.load(filename) as data:
+        if "counts" not in data:
+            sys.exit("%s is not a juliart counts file." % filename)
+        return {key: data[key] if key == "counts" else data[key].item() for key in data}
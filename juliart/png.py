@@ -0,0 +1,96 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+import numpy
+import struct
+import sys
+import zlib
+
+signature = b"\x89PNG\r\n\x1a\n"
+
+
+class PNGWriter:
+    """A PNGWriter writes an RGBA png one strip of rows at a time, so that
+       an image never has to be held in memory all at once. Rows are filtered
+       (each byte minus the one to its left) and compressed as they are
+       added, and compressed data is written out as it comes. The image is
+       finished (and checked to have all of its rows) when it is closed.
+    """
+
+    def __init__(self, filename, width, height, level=6):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.compressor = zlib.compressobj(level)
+        self.fh = open(filename, "wb")
+        self.fh.write(signature)
+
+        # 8 bits per channel, color type 6 (RGBA), no interlacing
+        header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+        self.write_chunk(b"IHDR", header)
+
+    def __str__(self):
+        return "[png-writer][%s][rows:%s/%s]" % (self.filename, self.rows, self.height)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fh.close()
+
+    def write_chunk(self, kind, data):
+        self.fh.write(struct.pack(">I", len(data)))
+        self.fh.write(kind)
+        self.fh.write(data)
+        self.fh.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write(self, rows):
+        """Add the next strip of rows, an array of RGBA values (uint8) with
+           shape (rows, width, 4).
+        """
+        rows = numpy.asarray(rows, dtype=numpy.uint8)
+        if rows.shape[1:] != (self.width, 4):
+            sys.exit(
+                "Rows must have shape (n, %s, 4), found %s" % (self.width, rows.shape)
+            )
+        if self.rows + len(rows) > self.height:
+            sys.exit("The image only has %s rows." % self.height)
+
+        # Each row starts with its filter type, 1 (sub) is the difference
+        # between each byte and the same channel of the pixel to its left
+        data = rows.reshape(len(rows), self.width * 4)
+        filtered = numpy.empty((len(rows), self.width * 4 + 1), dtype=numpy.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:5] = data[:, :4]
+        filtered[:, 5:] = data[:, 4:] - data[:, :-4]
+
+        compressed = self.compressor.compress(filtered.tobytes())
+        if compressed:
+            self.write_chunk(b"IDAT", compressed)
+        self.rows += len(rows)
+
+    def close(self):
+        """Finish the image, after all rows have been written.
+        """
+        if self.fh.closed:
+            return
+        if self.rows != self.height:
+            self.fh.close()
+            sys.exit("Only %s of %s rows were written." % (self.rows, self.height))
+        self.write_chunk(b"IDAT", self.compressor.flush())
+        self.write_chunk(b"IEND", b"")
+        self.fh.close()
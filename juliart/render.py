@@ -0,0 +1,599 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from .engines import get_engine
+from .grid import subsample_offsets
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import itertools
+import numpy
+import os
+import sys
+
+methods = ["brute", "adaptive"]
+
+
+def count_dtype(iterations, smooth=False):
+    """Return the smallest unsigned integer type that can hold counts up to
+       iterations, or float32 for smooth (continuous) counts.
+    """
+    if smooth:
+        return numpy.float32
+    if iterations < 2 ** 16:
+        return numpy.uint16
+    return numpy.uint32
+
+
+def render_counts(
+    za,
+    zb,
+    ca,
+    cb,
+    engine="numpy",
+    workers=1,
+    symmetric=False,
+    method="brute",
+    **options
+):
+    """Render the escape time counts for a coordinate grid (see grid.meshgrid)
+       where za are the real coordinates (columns) and zb the imaginary
+       coordinates (rows). Any other options (e.g., iterations and radius)
+       are passed on to the engine.
+
+       Parameters
+       ==========
+       engine: the name of the escape time engine (see engines.py)
+       workers: with more than one, render bands of rows in a process pool
+       symmetric: if the grid is centered on the origin, only render half
+       method: brute renders every pixel, adaptive subdivides rectangles
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+
+    if method not in methods:
+        sys.exit("Method %s is not valid, choices are %s" % (method, methods))
+
+    if symmetric and is_symmetric(za, zb):
+        return render_symmetric(
+            za, zb, ca, cb, engine=engine, workers=workers, method=method, **options
+        )
+
+    if workers > 1 and za.shape[0] > 1:
+        return render_bands(
+            za, zb, ca, cb, engine=engine, workers=workers, method=method, **options
+        )
+
+    if method == "adaptive":
+        return render_adaptive(za, zb, ca, cb, engine=engine, **options)
+    return get_engine(engine)(za, zb, ca, cb, **options)
+
+
+def is_symmetric(za, zb, supersample=1):
+    """Determine if a coordinate grid is centered on the origin, meaning that
+       the point for pixel (x, y) is exactly the negative of the point for
+       pixel (width - x, height - y), so the counts are the same as rendering
+       both (see grid.coordinates). The first row and column have no mirror.
+       With supersample N, each pixel is N subsamples (in each direction).
+    """
+    xs, ys = za[0], zb[:, 0]
+    if len(xs) < 2 * supersample or len(ys) < 2 * supersample:
+        return False
+    for values in [xs[supersample:], ys[supersample:]]:
+        if not numpy.array_equal(values, -values[::-1]):
+            return False
+    return True
+
+
+def render_symmetric(za, zb, ca, cb, workers=1, **options):
+    """A quadratic Julia set is symmetric under z -> -z, so for a grid centered
+       on the origin the count at pixel (x, y) is the same as at its mirror,
+       (width - x, height - y). We render the top half of the rows and the
+       first column (which has no mirror), and fill in the rest.
+    """
+    height, width = za.shape
+    half = height // 2 + 1
+
+    top = render_counts(za[:half], zb[:half], ca, cb, workers=workers, **options)
+    counts = numpy.empty(za.shape, dtype=top.dtype)
+    counts[:half] = top
+    counts[half:, :1] = render_counts(za[half:, :1], zb[half:, :1], ca, cb, **options)
+
+    # Row y mirrors row height - y, and column x mirrors column width - x
+    mirrors = height - numpy.arange(half, height)
+    counts[half:, 1:] = counts[mirrors, :0:-1]
+    return counts
+
+
+def render_adaptive(za, zb, ca, cb, engine="numpy", tile=64, min_size=8, **options):
+    """Render with Mariani-Silver subdivision. We start with tiles, and for
+       each rectangle render only the border. If every border pixel has the
+       same count (e.g., a rectangle of interior pixels) we fill it, otherwise
+       we split it in half along the longer side and check both halves.
+       Rectangles smaller than min_size are rendered in full. Each round
+       renders the pixels for all rectangles in one call to the engine.
+    """
+    engine = get_engine(engine)
+    height, width = za.shape
+    counts = None
+    done = numpy.zeros(za.shape, dtype=bool)
+
+    # Starting from tiles (instead of the whole image) keeps large rectangles
+    # from enclosing an island of different counts
+    rects = [
+        (y, min(y + tile, height), x, min(x + tile, width))
+        for y in range(0, height, tile)
+        for x in range(0, width, tile)
+    ]
+
+    while rects:
+        needed = numpy.zeros(za.shape, dtype=bool)
+        for y0, y1, x0, x1 in rects:
+            if y1 - y0 <= min_size or x1 - x0 <= min_size:
+                needed[y0:y1, x0:x1] = True
+            else:
+                needed[[y0, y1 - 1], x0:x1] = True
+                needed[y0:y1, [x0, x1 - 1]] = True
+
+        needed &= ~done
+        if needed.any():
+            values = engine(za[needed], zb[needed], ca, cb, **options)
+            if counts is None:
+                counts = numpy.zeros(za.shape, dtype=values.dtype)
+            counts[needed] = values
+            done |= needed
+
+        # Fill or split each rectangle that wasn't rendered in full
+        subdivided = []
+        for y0, y1, x0, x1 in rects:
+            if y1 - y0 <= min_size or x1 - x0 <= min_size:
+                continue
+            border = numpy.concatenate(
+                [
+                    counts[y0, x0:x1],
+                    counts[y1 - 1, x0:x1],
+                    counts[y0:y1, x0],
+                    counts[y0:y1, x1 - 1],
+                ]
+            )
+            if (border == border[0]).all():
+                counts[y0:y1, x0:x1] = border[0]
+                done[y0:y1, x0:x1] = True
+            elif y1 - y0 > x1 - x0:
+                middle = (y0 + y1) // 2
+                subdivided += [(y0, middle, x0, x1), (middle, y1, x0, x1)]
+            else:
+                middle = (x0 + x1) // 2
+                subdivided += [(y0, y1, x0, middle), (y0, y1, middle, x1)]
+        rects = subdivided
+
+    return counts
+
+
+def render_supersampled(
+    xs,
+    ys,
+    ca,
+    cb,
+    colorize,
+    supersample=2,
+    symmetric=False,
+    workers=1,
+    max_points=2 ** 18,
+    **options
+):
+    """Render an anti-aliased image from subsample coordinates (see
+       grid.coordinates), with supersample x supersample subsamples per pixel.
+       We render bands of rows of at most max_points subsamples, color them
+       (colorize is a function that takes counts and returns RGBA colors) and
+       average each pixel's subsamples, so memory is close to the size of the
+       final image. With more than one worker, the bands are rendered in one
+       process pool (so colorize must be picklable). Other options are passed
+       on to render_counts. We return an array of RGBA colors, with rows as y
+       and columns as x.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    width, height = len(xs) // supersample, len(ys) // supersample
+    image = numpy.empty((height, width, 4), dtype=numpy.uint8)
+
+    # For a grid centered on the origin, we can mirror half of the pixels
+    half = height
+    if symmetric and is_symmetric(xs[None, :], ys[:, None], supersample):
+        half = height // 2 + 1
+
+    # Several bands per worker, since rows through the set are slower
+    rows = max(1, max_points // (width * supersample * supersample))
+    if workers > 1:
+        rows = min(rows, max(1, -(-half // (workers * 4))))
+    bands = [
+        (xs, ys[start * supersample : (start + rows) * supersample], start)
+        for start in range(0, half, rows)
+    ]
+
+    # The first column has no mirror (see render_symmetric)
+    if half < height:
+        bands.append((xs[:supersample], ys[half * supersample :], half))
+
+    def paste(band, colors):
+        start = band[2]
+        image[start : start + len(colors), : colors.shape[1]] = colors
+
+    if workers == 1:
+        for band in bands:
+            paste(
+                band,
+                _render_pixels(*band[:2], ca, cb, colorize, supersample, **options),
+            )
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _render_pixels, *band[:2], ca, cb, colorize, supersample, **options
+                )
+                for band in bands
+            ]
+            for band, future in zip(bands, futures):
+                paste(band, future.result())
+
+    if half < height:
+        mirrors = height - numpy.arange(half, height)
+        image[half:, 1:] = image[mirrors, :0:-1]
+    return image
+
+
+def render_strips(
+    xs,
+    ys,
+    ca,
+    cb,
+    colorize,
+    rows=None,
+    workers=1,
+    supersample=1,
+    max_points=2 ** 20,
+    **options
+):
+    """Render an image one strip of rows at a time, for images that are too
+       large to keep in memory. xs and ys are the pixel (or subsample, see
+       grid.coordinates) coordinates, and colorize is a function that takes
+       counts and returns RGBA colors (it must be picklable for workers). We
+       yield the first row and RGBA colors of each strip, in order. Strips
+       have rows rows, or as many as fit in max_points. With more than one
+       worker, strips are rendered in a process pool, with only a few strips
+       per worker in flight at once. Other options go to render_counts.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    width, height = len(xs) // supersample, len(ys) // supersample
+    if not rows:
+        rows = max(1, max_points // (width * supersample * supersample))
+
+    strips = (
+        (
+            start,
+            xs,
+            ys[start * supersample : (start + rows) * supersample],
+            ca,
+            cb,
+            colorize,
+            supersample,
+            options,
+        )
+        for start in range(0, height, rows)
+    )
+
+    if workers == 1:
+        for strip in strips:
+            yield strip[0], _render_strip(*strip[1:])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for strip in itertools.islice(strips, workers * 2):
+            pending.append((strip[0], executor.submit(_render_strip, *strip[1:])))
+        while pending:
+            start, future = pending.popleft()
+            colors = future.result()
+            for strip in itertools.islice(strips, 1):
+                pending.append((strip[0], executor.submit(_render_strip, *strip[1:])))
+            yield start, colors
+
+
+def _render_strip(xs, ys, ca, cb, colorize, supersample, options):
+    """Render and color one strip of rows (possibly in a worker).
+    """
+    if supersample > 1:
+        return render_supersampled(
+            xs, ys, ca, cb, colorize, supersample=supersample, **options
+        )
+    za, zb = numpy.meshgrid(xs, ys)
+    return colorize(render_counts(za, zb, ca, cb, **options))
+
+
+def find_edges(values, tolerance=0.5):
+    """Return a mask of pixels whose value (a count, or any channel of a color)
+       differs by more than tolerance from any of their eight neighbors, e.g.,
+       along the boundary of the set or between two bands of color.
+    """
+    values = numpy.asarray(values, dtype=numpy.float32)
+    edges = numpy.zeros(values.shape[:2], dtype=bool)
+    for a, b in [
+        ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+        ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+        ((slice(1, None), slice(1, None)), (slice(None, -1), slice(None, -1))),
+        ((slice(1, None), slice(None, -1)), (slice(None, -1), slice(1, None))),
+    ]:
+        different = numpy.abs(values[a] - values[b]) > tolerance
+        if different.ndim > 2:
+            different = different.any(axis=-1)
+        edges[a] |= different
+        edges[b] |= different
+    return edges
+
+
+def grow_mask(mask):
+    """Grow a mask (e.g., of edges, see find_edges) by one pixel, to each of
+       the eight neighbors of every pixel in it.
+    """
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    rows = grown.copy()
+    grown[:, 1:] |= rows[:, :-1]
+    grown[:, :-1] |= rows[:, 1:]
+    return grown
+
+
+def render_edges(
+    za,
+    zb,
+    ca,
+    cb,
+    colors,
+    colorize,
+    counts=None,
+    supersample=2,
+    symmetric=False,
+    engine="numpy",
+    tolerance=8,
+    max_points=2 ** 18,
+    **options
+):
+    """Anti-alias only the pixels along edges of a rendered image, where the
+       color differs from a neighbor by more than tolerance (see find_edges),
+       or the count (if counts are provided) by more than half an iteration.
+       A thin filament can cross pixels whose colors look flat, so we check
+       the counts too, and grow the edges by a pixel to catch filaments that
+       pass between pixel centers. For each edge pixel we render the corners
+       of supersample x supersample points spread across it (the same points
+       as render_supersampled). If they have the same color as the pixel
+       (within tolerance) we use their average, and otherwise we render the
+       rest of the points and use the average of all of them, in chunks of
+       at most max_points. colors is the RGBA array for the pixels
+       (from colorize) and is updated in place. Flat regions (e.g., the
+       interior or far outside) are left as they are. We return the number
+       of pixels that were re-rendered.
+    """
+    engine = get_engine(engine)
+    height, width = colors.shape[:2]
+    edges = find_edges(colors, tolerance)
+    if counts is not None:
+        edges |= find_edges(counts)
+    edges = grow_mask(edges)
+
+    # For a grid centered on the origin, the bottom half is a mirror
+    half = height
+    if symmetric and is_symmetric(za, zb):
+        half = height // 2 + 1
+        edges[half:, 1:] = False
+
+    # Subsample offsets across a pixel, scaled by the pixel spacing
+    offsets = subsample_offsets(supersample)
+    dx = za[0, 1] - za[0, 0] if width > 1 else 0
+    dy = zb[1, 0] - zb[0, 0] if height > 1 else 0
+
+    # Subsamples are rendered in two steps. The corners come first, and the
+    # center (for an odd supersample) is the pixel itself. The rest are only
+    # rendered for pixels where those don't all have the same color
+    first = numpy.zeros((supersample, supersample), dtype=bool)
+    first[numpy.ix_([0, -1], [0, -1])] = True
+    known = first.ravel().copy()
+    center = supersample * supersample // 2 if supersample % 2 else None
+    if center is not None:
+        known[center] = True
+    first, rest = numpy.flatnonzero(first), numpy.flatnonzero(~known)
+    known = numpy.flatnonzero(known)
+
+    rows, cols = numpy.nonzero(edges)
+    samples = supersample * supersample
+    chunk = max(1, max_points // samples)
+    for start in range(0, len(rows), chunk):
+        y, x = rows[start : start + chunk], cols[start : start + chunk]
+        sub_a = za[y, x][:, None, None] + (offsets * dx)[None, None, :]
+        sub_b = zb[y, x][:, None, None] + (offsets * dy)[None, :, None]
+        sub_a, sub_b = numpy.broadcast_arrays(sub_a, sub_b)
+        sub_a = sub_a.reshape(len(y), samples)
+        sub_b = sub_b.reshape(len(y), samples)
+
+        values = numpy.empty((len(y), samples, 4), dtype=numpy.uint8)
+        values[:, first] = colorize(
+            engine(sub_a[:, first], sub_b[:, first], ca, cb, **options)
+        )
+        if center is not None:
+            values[:, center] = colors[y, x]
+
+        # A pixel is flat at this scale (e.g., one side of a wide band) if
+        # the known subsamples are the same color (within tolerance)
+        seen = values[:, known]
+        flat = (seen.max(axis=1) - seen.min(axis=1) <= tolerance).all(axis=1)
+        total = seen.sum(axis=1, dtype=numpy.uint32)
+        colors[y[flat], x[flat]] = (total[flat] + len(known) // 2) // len(known)
+
+        y, x, values = y[~flat], x[~flat], values[~flat]
+        if len(rest) and len(y):
+            a, b = sub_a[~flat][:, rest], sub_b[~flat][:, rest]
+            values[:, rest] = colorize(engine(a, b, ca, cb, **options))
+        total = values.sum(axis=1, dtype=numpy.uint32)
+        colors[y, x] = (total + samples // 2) // samples
+
+    if half < height:
+        mirrors = height - numpy.arange(half, height)
+        colors[half:, 1:] = colors[mirrors, :0:-1]
+    return len(rows)
+
+
+def resample_counts(counts, xs, ys, previous_xs, previous_ys):
+    """Resample counts from a previous grid (with columns previous_xs and rows
+       previous_ys, e.g., the last frame of an animation) onto a new grid with
+       columns xs and rows ys, where each new pixel takes the count of the
+       nearest previous pixel. We return the counts, and a mask of the pixels
+       that are known: the nearest previous pixel has the same count as all of
+       its eight neighbors (see find_edges), so the new pixel (no more than half
+       a pixel away) is in a flat region. Pixels outside of the previous grid,
+       or near an edge, aren't known and need to be rendered.
+    """
+    height, width = counts.shape
+    if width < 3 or height < 3:
+        shape = (len(ys), len(xs))
+        return numpy.zeros(shape, dtype=counts.dtype), numpy.zeros(shape, dtype=bool)
+
+    flat = ~find_edges(counts, tolerance=0)
+    flat[[0, -1], :] = False
+    flat[:, [0, -1]] = False
+
+    # The nearest previous column and row for each new column and row
+    columns = numpy.rint(
+        (xs - previous_xs[0]) / (previous_xs[1] - previous_xs[0])
+    ).astype(numpy.int64)
+    rows = numpy.rint((ys - previous_ys[0]) / (previous_ys[1] - previous_ys[0])).astype(
+        numpy.int64
+    )
+    inside = (rows[:, None] >= 0) & (rows[:, None] < height)
+    inside = inside & (columns >= 0) & (columns < width)
+    rows, columns = numpy.clip(rows, 0, height - 1), numpy.clip(columns, 0, width - 1)
+
+    resampled = counts[numpy.ix_(rows, columns)]
+    known = inside & flat[numpy.ix_(rows, columns)]
+    return resampled, known
+
+
+def render_unknown(
+    za, zb, ca, cb, counts, known, engine="numpy", workers=1, symmetric=False, **options
+):
+    """Render the pixels of a grid that aren't known (a mask, e.g., from
+       resample_counts) and fill them in to counts, in place. For a grid
+       centered on the origin (see render_symmetric) we only render the top
+       half and mirror the rest, and with more than one worker the pixels are
+       split into chunks for a process pool. We return the number of pixels
+       that were rendered.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    engine = get_engine(engine)
+    height = counts.shape[0]
+
+    half = height
+    if symmetric and is_symmetric(za, zb):
+        half = height // 2 + 1
+        known = known.copy()
+        known[half:, 1:] = True
+
+    unknown = ~known
+    total = int(unknown.sum())
+    if total and workers > 1:
+        points_a, points_b = za[unknown], zb[unknown]
+        chunks = numpy.array_split(numpy.arange(total), workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    engine, points_a[chunk], points_b[chunk], ca, cb, **options
+                )
+                for chunk in chunks
+                if len(chunk)
+            ]
+            counts[unknown] = numpy.concatenate([future.result() for future in futures])
+    elif total:
+        counts[unknown] = engine(za[unknown], zb[unknown], ca, cb, **options)
+
+    if half < height:
+        mirrors = height - numpy.arange(half, height)
+        counts[half:, 1:] = counts[mirrors, :0:-1]
+    return total
+
+
+def _render_pixels(xs, ys, ca, cb, colorize, supersample, **options):
+    """Render and color the subsamples for a band of pixels, and return the
+       average color of each pixel.
+    """
+    za, zb = numpy.meshgrid(xs, ys)
+    colors = colorize(render_counts(za, zb, ca, cb, **options))
+    height, width = len(ys) // supersample, len(xs) // supersample
+    colors = colors.reshape(height, supersample, width, supersample, 4)
+    total = colors.sum(axis=(1, 3), dtype=numpy.uint32)
+    samples = supersample * supersample
+    return ((total + samples // 2) // samples).astype(numpy.uint8)
+
+
+def render_bands(za, zb, ca, cb, workers=2, **options):
+    """Split the grid into row bands and render each in a process pool worker.
+       Workers write counts directly into a shared memory array, so the pixels
+       are never pickled on the way back. We make several bands per worker
+       since rows through the middle of the set are much slower than the edges.
+    """
+    # Workers only need the coordinates of each column and row
+    xs, ys = za[0], zb[:, 0]
+    shape = (len(ys), len(xs))
+    dtype = numpy.dtype(
+        count_dtype(options.get("iterations", 200), options.get("smooth", False))
+    )
+    step = max(1, -(-shape[0] // (workers * 4)))
+
+    shm = shared_memory.SharedMemory(
+        create=True, size=max(1, shape[0] * shape[1] * dtype.itemsize)
+    )
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _render_band,
+                    shm.name,
+                    shape,
+                    dtype.str,
+                    start,
+                    xs,
+                    ys[start : start + step],
+                    ca,
+                    cb,
+                    options,
+                )
+                for start in range(0, shape[0], step)
+            ]
+            for future in futures:
+                future.result()
+
+        counts = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return counts
+
+
+def _render_band(name, shape, dtype, start, xs, ys, ca, cb, options):
+    """Render one band of rows (in a worker) into the shared memory counts.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        counts = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        za, zb = numpy.meshgrid(xs, ys)
+        counts[start : start + len(ys)] = render_counts(za, zb, ca, cb, **options)
+        del counts
+    finally:
+        shm.close()
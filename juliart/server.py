@@ -0,0 +1,278 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from .batch import generate, parse_row
+from .grid import GridCache
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qsl, urlparse
+import functools
+import json
+import os
+import threading
+import time
+
+# Coordinate grids kept warm in each worker process
+_worker_grid_cache = None
+
+
+def _init_render_worker():
+    global _worker_grid_cache
+    _worker_grid_cache = GridCache()
+
+
+def render_png(params):
+    """Render a Julia Set (in a worker) from a dictionary of request parameters
+       and return a tuple of the png bytes and an error (one of them is None).
+    """
+    try:
+        juliaset = generate(dict(params, grid_cache=_worker_grid_cache))
+        png = BytesIO()
+        juliaset.image.save(png, "PNG")
+        return png.getvalue(), None
+    except (Exception, SystemExit) as exc:
+        return None, str(exc) or exc.__class__.__name__
+
+
+class RenderServer(ThreadingHTTPServer):
+    """A RenderServer accepts render requests over http, and renders them in a
+       persistent pool of worker processes (that keep their caches warm). At
+       most workers + queue_size requests are accepted at once, and any more
+       are turned away (503) until a slot frees up. A request that isn't done
+       after timeout seconds returns a 504, but its render keeps a worker busy
+       until it finishes, so res, iter and supersample are limited. If a
+       worker dies (e.g., it runs out of memory) the pool is broken, and we
+       start a new one.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8080,
+        workers=1,
+        queue_size=8,
+        timeout=60,
+        max_res=4000,
+        max_iter=5000,
+        max_supersample=4,
+        engine="numpy",
+        cache=None,
+    ):
+        super().__init__((host, port), RenderHandler)
+        if workers is None or workers < 1:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_res = max_res
+        self.max_iter = max_iter
+        self.max_supersample = max_supersample
+        self.engine = engine
+        self.cache = cache
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_render_worker
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.served = 0
+        self.restarts = 0
+
+    def __str__(self):
+        return "[juliart-server][%s:%s][workers:%s][queue:%s]" % (
+            self.server_address[0],
+            self.server_address[1],
+            self.workers,
+            self.queue_size,
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def submit(self, params):
+        """Submit a render request, returning a future, or None if we are full.
+           The slot is only released when the render is done (not when the
+           request gives up waiting) so that the limit reflects actual work.
+           If the pool is broken, we start a new one and raise BrokenProcessPool.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        with self.lock:
+            self.pending += 1
+            executor = self.executor
+        try:
+            future = executor.submit(render_png, params)
+        except BrokenProcessPool:
+            self.release(executor)
+            raise
+        future.add_done_callback(functools.partial(self.release, executor))
+        return future
+
+    def release(self, executor, future=None):
+        """Release the slot for a render, and start a new pool if its worker
+           died (every render in the broken pool fails with it).
+        """
+        broken = future is None or (
+            not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+        )
+        with self.lock:
+            self.pending -= 1
+            if future is not None:
+                self.served += 1
+
+            # Other renders in the same pool may have started a new one
+            if broken and executor is self.executor:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_render_worker
+                )
+                self.restarts += 1
+        self.slots.release()
+
+    def status(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self.pending,
+                "served": self.served,
+                "restarts": self.restarts,
+            }
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """Handle requests for /render (GET with query parameters, or POST with a
+       json object) and /status. Parameters are the same as the columns for
+       juliart batch (e.g., ca, cb, res, iter, zoom, color, theme, text).
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            return self.send_json(200, self.server.status())
+        if url.path != "/render":
+            return self.send_json(404, {"error": "Not found: %s" % url.path})
+        self.render(dict(parse_qsl(url.query)))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/render":
+            return self.send_json(404, {"error": "Not found: %s" % url.path})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or "{}")
+        except ValueError as exc:
+            return self.send_json(400, {"error": "Invalid json: %s" % exc})
+        if not isinstance(params, dict):
+            return self.send_json(400, {"error": "Request must be a json object"})
+        self.render(params)
+
+    def render(self, params):
+        """Validate parameters, and then render and return the png.
+        """
+        params.pop("outfile", None)
+        try:
+            params = parse_row(params)
+        except (TypeError, ValueError) as exc:
+            return self.send_json(400, {"error": str(exc)})
+
+        # A render that times out keeps its worker busy, so limit the work
+        sizes = [
+            params.get("res", 1000),
+            params.get("width", 0),
+            params.get("height", 0),
+        ]
+        if max(sizes) > self.server.max_res:
+            return self.send_json(
+                400,
+                {
+                    "error": "res, width and height must be at most %s"
+                    % self.server.max_res
+                },
+            )
+        if params.get("iter", 200) > self.server.max_iter:
+            return self.send_json(
+                400, {"error": "iter must be at most %s" % self.server.max_iter}
+            )
+        if params.get("supersample", 1) > self.server.max_supersample:
+            return self.send_json(
+                400,
+                {
+                    "error": "supersample must be at most %s"
+                    % self.server.max_supersample
+                },
+            )
+        params.setdefault("engine", self.server.engine)
+        params["cache"] = self.server.cache
+
+        start = time.time()
+        try:
+            future = self.server.submit(params)
+        except BrokenProcessPool:
+            return self.send_json(
+                503,
+                {"error": "Render workers are restarting, try again"},
+                {"Retry-After": "1"},
+            )
+        if future is None:
+            return self.send_json(
+                503, {"error": "Server is busy, try again"}, {"Retry-After": "1"}
+            )
+
+        try:
+            png, error = future.result(timeout=self.server.timeout)
+        except TimeoutError:
+            future.cancel()
+            return self.send_json(504, {"error": "Render timed out"})
+        except BrokenProcessPool:
+            return self.send_json(
+                500, {"error": "A render worker died (e.g., it ran out of memory)"}
+            )
+
+        if error is not None:
+            return self.send_json(400, {"error": error})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.send_header("X-Render-Seconds", "%.3f" % (time.time() - start))
+        self.end_headers()
+        self.wfile.write(png)
+
+    def send_json(self, code, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(**kwargs):
+    """Start a RenderServer (see its arguments) and serve until interrupted.
+    """
+    server = RenderServer(**kwargs)
+    host, port = server.server_address[:2]
+    print("Serving Julia Sets at http://%s:%s/render" % (host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
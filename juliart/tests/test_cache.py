@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Test that re-coloring a Julia Set with a RenderCache doesn't render it again.
+
+"""
+
+from juliart.cache import RenderCache
+from juliart.main import JuliaSet
+from unittest import mock
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = RenderCache(self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def generate(self, **kwargs):
+        juliaset = JuliaSet(
+            resolution=100, ca=-0.8, cb=0.156, quiet=True, cache=self.cache, **kwargs
+        )
+        juliaset.generate_image()
+        return juliaset
+
+    def test_recolor(self):
+        print("Testing that a recolor is a cache hit")
+        first = self.generate(color="random", theme="winter")
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+
+        with mock.patch("juliart.main.render_counts", side_effect=AssertionError):
+            second = self.generate(color="glow", theme="halloween")
+        numpy.testing.assert_array_equal(second.counts, first.counts)
+        self.assertFalse(numpy.array_equal(second.image, first.image))
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+
+    def test_miss(self):
+        print("Testing that different parameters are a cache miss")
+        self.generate()
+        self.generate(iterations=100)
+        self.assertEqual(len(os.listdir(self.tmpdir)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
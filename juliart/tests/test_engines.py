@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Test that the numpy engine gives the same counts as the python engine.
+
+"""
+
+from juliart.engines import numpy_engine, python_engine
+from juliart.grid import meshgrid
+import numpy
+import unittest
+
+cparams = [(-0.8, 0.156), (0.285, 0.01), (-0.4, 0.6)]
+
+
+class TestEngines(unittest.TestCase):
+    def setUp(self):
+        self.za, self.zb = meshgrid((40, 30), 1.5)
+
+    def test_counts(self):
+        print("Testing numpy engine counts against python engine")
+        for ca, cb in cparams:
+            for bailout in ["squared", "legacy"]:
+                options = {"iterations": 100, "bailout": bailout}
+                expected = python_engine(self.za, self.zb, ca, cb, **options)
+                counts = numpy_engine(self.za, self.zb, ca, cb, **options)
+                numpy.testing.assert_array_equal(counts, expected)
+
+    def test_periodicity(self):
+        print("Testing numpy engine periodicity against python engine")
+        for ca, cb in cparams:
+            options = {"iterations": 300, "periodicity": 1e-10}
+            expected = python_engine(self.za, self.zb, ca, cb, **options)
+            counts = numpy_engine(self.za, self.zb, ca, cb, **options)
+            numpy.testing.assert_array_equal(counts, expected)
+
+    def test_smooth(self):
+        print("Testing numpy engine smooth counts against python engine")
+        for ca, cb in cparams:
+            options = {"iterations": 100, "radius": 16, "smooth": True}
+            expected = python_engine(self.za, self.zb, ca, cb, **options)
+            counts = numpy_engine(self.za, self.zb, ca, cb, **options)
+            numpy.testing.assert_allclose(counts, expected, rtol=0, atol=1e-9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Test that the render methods (and symmetry) give the same counts as rendering
+every pixel.
+
+"""
+
+from juliart.grid import meshgrid
+from juliart.render import render_counts
+import numpy
+import unittest
+
+cparams = [(-0.8, 0.156), (0.285, 0.01), (-0.7269, 0.1889)]
+
+
+class TestRender(unittest.TestCase):
+    def test_adaptive(self):
+        print("Testing adaptive counts against brute force")
+        for resolution in [(150, 150), (201, 97)]:
+            za, zb = meshgrid(resolution, 1.5)
+            for ca, cb in cparams:
+                expected = render_counts(za, zb, ca, cb, iterations=500)
+                for symmetric in [False, True]:
+                    counts = render_counts(
+                        za,
+                        zb,
+                        ca,
+                        cb,
+                        iterations=500,
+                        method="adaptive",
+                        symmetric=symmetric,
+                    )
+                    numpy.testing.assert_array_equal(counts, expected)
+
+    def test_symmetric(self):
+        print("Testing symmetric counts against brute force")
+        for resolution, zoom in [((500, 500), 1.5), ((301, 200), 1.8)]:
+            za, zb = meshgrid(resolution, zoom)
+            for ca, cb in cparams:
+                expected = render_counts(za, zb, ca, cb, iterations=1000)
+                counts = render_counts(za, zb, ca, cb, iterations=1000, symmetric=True)
+                numpy.testing.assert_array_equal(counts, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
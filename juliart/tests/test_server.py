@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Test juliart serve against a RenderServer on localhost (an open port).
+
+"""
+
+from juliart.server import RenderServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+import json
+import os
+import signal
+import threading
+import time
+import unittest
+
+# A render that takes a few seconds, to keep the one worker busy
+slow = "/render?res=2000&iter=5000&ca=0.285&cb=0.01&supersample=2"
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.server = RenderServer(port=0, workers=1, queue_size=0, timeout=0.5)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%s" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.kill_workers()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def kill_workers(self):
+        for pid in list(self.server.executor._processes):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def request(self, path, data=None):
+        """Return the status, headers and body for a request.
+        """
+        try:
+            response = urlopen(self.url + path, data=data)
+        except HTTPError as response:
+            return response.code, response.headers, response.read()
+        return response.status, response.headers, response.read()
+
+    def test_render(self):
+        print("Testing render of a png")
+        code, headers, body = self.request("/render?res=50&iter=50&ca=-0.8&cb=0.156")
+        self.assertEqual(code, 200)
+        self.assertEqual(headers["Content-Type"], "image/png")
+        self.assertTrue(body.startswith(b"\x89PNG"))
+
+        data = json.dumps({"res": 50, "theme": "winter"}).encode("utf-8")
+        code, headers, body = self.request("/render", data)
+        self.assertEqual(code, 200)
+        self.assertTrue(body.startswith(b"\x89PNG"))
+
+    def test_invalid(self):
+        print("Testing invalid requests")
+        for path, data in [
+            ("/render?res=50&color=nope&notaparam=1", None),
+            ("/render?res=abc", None),
+            ("/render", json.dumps({"res": [1]}).encode("utf-8")),
+            ("/render", b"not json"),
+            ("/render?res=5000", None),
+            ("/render?iter=100000", None),
+            ("/render?supersample=10", None),
+        ]:
+            code, _, body = self.request(path, data)
+            self.assertEqual(code, 400, path)
+            self.assertIn("error", json.loads(body))
+        self.assertEqual(self.request("/nope")[0], 404)
+
+    def test_timeout_and_busy(self):
+        print("Testing timeout (504) and busy (503)")
+        code, _, _ = self.request(slow)
+        self.assertEqual(code, 504)
+
+        # The render keeps its slot until it's done
+        code, headers, _ = self.request("/render?res=50")
+        self.assertEqual(code, 503)
+        self.assertEqual(headers["Retry-After"], "1")
+
+        code, _, body = self.request("/status")
+        self.assertEqual(code, 200)
+        status = json.loads(body)
+        self.assertEqual(status["pending"], 1)
+        self.assertEqual(status["workers"], 1)
+
+    def test_worker_dies(self):
+        print("Testing a worker that dies")
+        self.server.timeout = 30
+        results = []
+        request = threading.Thread(target=lambda: results.append(self.request(slow)))
+        request.start()
+        while not self.server.executor._processes or not self.server.pending:
+            time.sleep(0.05)
+        time.sleep(0.5)
+        self.kill_workers()
+        request.join()
+        self.assertEqual(results[0][0], 500)
+
+        # A new pool is started for the next requests
+        for attempt in range(20):
+            code, headers, _ = self.request("/render?res=50")
+            if code != 503:
+                break
+            time.sleep(float(headers["Retry-After"]) / 10)
+        self.assertEqual(code, 200)
+        status = json.loads(self.request("/status")[2])
+        self.assertEqual(status["restarts"], 1)
+        self.assertEqual(status["pending"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+Test that a streamed png is the same image as one rendered in memory.
+
+"""
+
+from juliart.main import JuliaSet
+from PIL import Image
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_stream(self):
+        print("Testing a streamed png against an image in memory")
+        for width, height, supersample in [(120, 90, 1), (101, 77, 2)]:
+            juliaset = JuliaSet(
+                width=width, height=height, ca=-0.8, cb=0.156, quiet=True
+            )
+            juliaset.palette = juliaset.build_palette()
+            juliaset.generate_image(supersample=supersample)
+            expected = numpy.asarray(juliaset.image)
+
+            outfile = os.path.join(self.tmpdir, "stream.png")
+            juliaset.generate_stream(outfile, rows=16, supersample=supersample)
+            with Image.open(outfile) as image:
+                self.assertEqual(image.mode, "RGBA")
+                numpy.testing.assert_array_equal(numpy.asarray(image), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,277 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+from .colors import apply_palette
+from .main import JuliaSet
+from .render import render_counts
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+import json
+import math
+import numpy
+import os
+import sys
+import tempfile
+
+formats = ["xyz", "dzi"]
+
+
+def pyramid(levels, tile_size=256, fmt="xyz"):
+    """Yield (level, size, column, row, path) for each tile in a pyramid,
+       where size is the width (and height) of the whole image at that level
+       and path is relative to the output directory. An xyz pyramid has
+       levels levels, with 2**level x 2**level tiles at each. A dzi pyramid
+       has the same largest level (tile_size * 2**(levels - 1) pixels), and
+       then halves it down to a single pixel (see the DeepZoom spec).
+    """
+    if fmt == "xyz":
+        for level in range(levels):
+            count = 2 ** level
+            for column in range(count):
+                for row in range(count):
+                    path = os.path.join(str(level), str(column), "%s.png" % row)
+                    yield level, tile_size * count, column, row, path
+
+    elif fmt == "dzi":
+        width = tile_size * 2 ** (levels - 1)
+        top = int(math.ceil(math.log2(width)))
+        for level in range(top + 1):
+            size = int(math.ceil(width / 2 ** (top - level)))
+            count = int(math.ceil(size / tile_size))
+            for column in range(count):
+                for row in range(count):
+                    path = os.path.join(
+                        "tiles_files", str(level), "%s_%s.png" % (column, row)
+                    )
+                    yield level, size, column, row, path
+
+    else:
+        sys.exit("Format %s is not valid, choices are %s" % (fmt, ", ".join(formats)))
+
+
+def render_tile(
+    filename, size, column, row, tile_size, ca, cb, zoom, palette, iterations, options
+):
+    """Render a single tile (in a worker) at its native resolution, where the
+       whole image at this level is size pixels across [-zoom, zoom]. The
+       tile is written to a temporary file and moved into place, so a tile
+       that exists is always complete.
+    """
+    x0, y0 = column * tile_size, row * tile_size
+    pixels_x = numpy.arange(x0, min(x0 + tile_size, size))
+    pixels_y = numpy.arange(y0, min(y0 + tile_size, size))
+    xs = -zoom + (pixels_x / float(size) * (zoom + zoom))
+    ys = -zoom + (pixels_y / float(size) * (zoom + zoom))
+    za, zb = numpy.meshgrid(xs, ys)
+
+    counts = render_counts(za, zb, ca, cb, **options)
+    image = Image.fromarray(apply_palette(counts, palette, iterations))
+
+    directory = os.path.dirname(filename)
+    if not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    fd, tmpfile = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            image.save(fh, "PNG")
+        os.replace(tmpfile, filename)
+    finally:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+    return filename
+
+
+def read_parameters(outdir, params):
+    """Given the parameters that determine the tiles (e.g., ca, cb, zoom,
+       iterations, color), return them with any that weren't given (None)
+       read back from render.json in outdir, if an earlier run wrote it. If
+       one that was given is different, the tiles wouldn't match, so we exit.
+    """
+    filename = os.path.join(outdir, "render.json")
+    if not os.path.exists(filename):
+        return params
+
+    with open(filename, "r") as fd:
+        saved = json.load(fd)
+    given = json.loads(json.dumps(params))
+    conflicts = [
+        "%s %s (not %s)" % (key, saved[key], value)
+        for key, value in given.items()
+        if value is not None and key in saved and saved[key] != value
+    ]
+    if conflicts:
+        sys.exit(
+            "Tiles in %s were rendered with %s, use the same parameters or another --outdir."
+            % (outdir, ", ".join(conflicts))
+        )
+    return {
+        key: saved.get(key) if value is None else value for key, value in params.items()
+    }
+
+
+def write_parameters(outdir, params):
+    """Write the parameters that determine the tiles to render.json in outdir
+       (before any are rendered), so that a later run can check them.
+    """
+    filename = os.path.join(outdir, "render.json")
+    with open(filename, "w") as fd:
+        json.dump(params, fd, indent=4)
+    return filename
+
+
+def write_manifest(outdir, fmt, levels, tile_size, juliaset, zoom):
+    """Write a manifest for a viewer, tiles.json (TileJSON) for xyz or
+       tiles.dzi (DeepZoom) for dzi, and return its path.
+    """
+    if fmt == "dzi":
+        width = tile_size * 2 ** (levels - 1)
+        filename = os.path.join(outdir, "tiles.dzi")
+        with open(filename, "w") as fd:
+            fd.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+                'Format="png" Overlap="0" TileSize="%s">\n'
+                '  <Size Width="%s" Height="%s"/>\n'
+                "</Image>\n" % (tile_size, width, width)
+            )
+        return filename
+
+    filename = os.path.join(outdir, "tiles.json")
+    with open(filename, "w") as fd:
+        json.dump(
+            {
+                "tilejson": "2.2.0",
+                "name": str(juliaset),
+                "scheme": "xyz",
+                "tiles": ["{z}/{x}/{y}.png"],
+                "minzoom": 0,
+                "maxzoom": levels - 1,
+                "tileSize": tile_size,
+                "ca": juliaset.ca,
+                "cb": juliaset.cb,
+                "zoom": zoom,
+                "iterations": juliaset.iterations,
+            },
+            fd,
+            indent=4,
+        )
+    return filename
+
+
+def generate_tiles(
+    outdir,
+    levels=4,
+    tile_size=256,
+    fmt="xyz",
+    zoom=None,
+    workers=1,
+    radius=None,
+    periodicity=None,
+    bailout="squared",
+    **kwargs
+):
+    """Render a tile pyramid (see pyramid) for a Julia Set into outdir, with
+       each tile rendered at its own resolution (not downsampled from a larger
+       image) in a pool of workers. Tiles that already exist are skipped, so
+       an interrupted run can be picked up again. The parameters (and
+       palette) are saved as render.json and palette.npy in outdir before
+       any tiles, and a second run uses them for any that aren't given, or
+       exits if one is different. Other keyword arguments (e.g., ca, cb,
+       color, theme, iterations, engine) go to the JuliaSet that determines
+       the colors for every tile. We return the manifest path.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    # Only these change the tiles (e.g., engine and method render the same)
+    params = {
+        "ca": kwargs.pop("ca", None),
+        "cb": kwargs.pop("cb", None),
+        "zoom": zoom,
+        "iterations": kwargs.pop("iterations", None),
+        "color": kwargs.pop("color", None),
+        "theme": kwargs.pop("theme", None),
+        "rgb": kwargs.pop("rgb", None),
+        "radius": radius,
+        "periodicity": periodicity,
+        "bailout": bailout,
+        "tile_size": tile_size,
+        "format": fmt,
+    }
+    resume = os.path.exists(os.path.join(outdir, "render.json"))
+    params = read_parameters(outdir, params)
+    defaults = {"zoom": 1.8, "iterations": 200, "color": "random", "theme": "random"}
+    for key, default in defaults.items():
+        if params[key] is None:
+            params[key] = default
+    juliaset = JuliaSet(
+        resolution=tile_size,
+        quiet=True,
+        ca=params["ca"],
+        cb=params["cb"],
+        iterations=params["iterations"],
+        color=params["color"],
+        theme=params["theme"],
+        rgb=params["rgb"],
+        **kwargs
+    )
+    params.update({"ca": juliaset.ca, "cb": juliaset.cb})
+    iterations = juliaset.iterations
+
+    # Every tile shares one palette, so colors match across tiles and levels.
+    # It's saved with the tiles, so that a second run matches the first
+    palette_file = os.path.join(outdir, "palette.npy")
+    palette = juliaset.palette
+    if palette is None and resume and os.path.exists(palette_file):
+        palette = numpy.load(palette_file)
+    if palette is None:
+        palette = juliaset.build_palette(iterations)
+    numpy.save(palette_file, numpy.asarray(palette, dtype=numpy.uint8))
+    write_parameters(outdir, params)
+    options = juliaset.get_options(
+        iterations, params["radius"], params["periodicity"], params["bailout"]
+    )
+    options.update({"engine": juliaset.engine, "method": juliaset.method})
+
+    tiles = list(pyramid(levels, tile_size, fmt))
+    todo = [tile for tile in tiles if not os.path.exists(os.path.join(outdir, tile[4]))]
+    print(
+        "Rendering %s of %s tiles (%s levels) with %s workers..."
+        % (len(todo), len(tiles), levels, workers)
+    )
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                render_tile,
+                os.path.join(outdir, path),
+                size,
+                column,
+                row,
+                tile_size,
+                juliaset.ca,
+                juliaset.cb,
+                params["zoom"],
+                palette,
+                iterations,
+                options,
+            )
+            for level, size, column, row, path in todo
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if done % 100 == 0 or done == len(futures):
+                print("[%s/%s] tiles rendered" % (done, len(futures)))
+
+    manifest = write_manifest(outdir, fmt, levels, tile_size, juliaset, params["zoom"])
+    print("Tiles are in %s, see %s" % (outdir, manifest))
+    return manifest
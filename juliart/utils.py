@@ -10,6 +10,9 @@ Modified from https://github.com/Visual-mov/Colorful-Julia (MIT License)
 
 """
 
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from PIL import ImageFont
 import os
 import sys
 
@@ -26,6 +29,14 @@ def get_font(filename="OpenSans-Regular.ttf"):
     return font_file
 
 
+@lru_cache(maxsize=32)
+def load_font(filename="OpenSans-Regular.ttf", fontsize=16):
+    """Load a font (see get_font) at a size. Fonts are cached, so that a process
+       generating many images (e.g., juliart batch) only loads each one once.
+    """
+    return ImageFont.truetype(get_font(filename), fontsize)
+
+
 def check_restricted(value, min_range, max_range):
     """Ensure that we have a float between a min and max range.
     """
@@ -36,3 +47,24 @@ def check_restricted(value, min_range, max_range):
 
     if value < min_range or value > max_range:
         sys.exit("ca and cb must be in range (-1, 1)")
+
+
+def parse_center(center):
+    """Parse a center point, either a string "x,y" or a pair of numbers, into
+       a pair of decimals, so that it keeps all of its digits for deep zooms.
+       None, or a center at the origin, returns None.
+    """
+    if center is None:
+        return None
+    if isinstance(center, str):
+        center = center.split(",")
+    try:
+        x, y = [Decimal(str(value).strip()) for value in center]
+    except (InvalidOperation, TypeError, ValueError):
+        sys.exit(
+            "Error parsing center %s, ensure it's two comma separated numbers."
+            % (center,)
+        )
+    if x == 0 and y == 0:
+        return None
+    return x, y
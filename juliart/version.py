@@ -8,7 +8,7 @@ with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 """
 
-__version__ = "0.0.16"
+__version__ = "0.0.41"
 AUTHOR = "Vanessa Sochat"
 AUTHOR_EMAIL = "vsochat@stanford.edu"
 NAME = "juliart"
@@ -21,8 +21,12 @@ LICENSE = "LICENSE"
 # Requirements
 
 
-INSTALL_REQUIRES = (("Pillow", {"min_version": "6.0.0"}),)
+INSTALL_REQUIRES = (
+    ("Pillow", {"min_version": "6.0.0"}),
+    ("numpy", {"min_version": "1.13.0"}),
+)
 TESTS_REQUIRES = (("pytest", {"min_version": "4.6.2"}),)
 ANIMATE_REQUIRES = (("imageio", {"min_version": "2.5.0"}),)
+VIDEO_REQUIRES = (("imageio-ffmpeg", {"min_version": "0.4.0"}),)
 
-INSTALL_REQUIRES_ALL = INSTALL_REQUIRES + ANIMATE_REQUIRES
+INSTALL_REQUIRES_ALL = INSTALL_REQUIRES + ANIMATE_REQUIRES + VIDEO_REQUIRES
@@ -0,0 +1,141 @@
+"""
+
+Copyright (C) 2019-2020 Vanessa Sochat.
+
+This Source Code Form is subject to the terms of the
+Mozilla Public License, v. 2.0. If a copy of the MPL was not distributed
+with this file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+
+import numpy
+import os
+import shutil
+import subprocess
+import sys
+
+# ffmpeg encoder arguments for each video format (by extension)
+codecs = {
+    ".mp4": [
+        "-c:v",
+        "libx264",
+        "-crf",
+        "20",
+        "-pix_fmt",
+        "yuv420p",
+        "-movflags",
+        "+faststart",
+    ],
+    ".webm": ["-c:v", "libvpx-vp9", "-crf", "32", "-b:v", "0", "-pix_fmt", "yuv420p"],
+}
+
+
+def get_ffmpeg():
+    """Return the path to an ffmpeg executable, either on the path or the one
+       that comes with imageio-ffmpeg (pip install juliart[video]).
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        sys.exit("ffmpeg is required to write video. pip install juliart[video]")
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+class VideoWriter:
+    """A VideoWriter encodes frames to an mp4 or webm video by piping their raw
+       pixels to an ffmpeg process, so frames are encoded as they are added
+       and never kept in memory. Every frame must be the same size, and the
+       process is started when the first frame is added (when we know it).
+       Frames are added with append_data, the same as an imageio writer.
+    """
+
+    def __init__(self, filename, fps=10):
+        self.filename = filename
+        self.extension = os.path.splitext(filename)[1].lower()
+        if self.extension not in codecs:
+            sys.exit(
+                "Video must be one of %s, found %s"
+                % (", ".join(codecs), self.extension)
+            )
+        self.fps = fps
+        self.shape = None
+        self.frames = 0
+        self.process = None
+
+    def __str__(self):
+        return "[video-writer][%s][frames:%s]" % (self.filename, self.frames)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.process is not None:
+            self.process.kill()
+            self.process.wait()
+
+    def start(self, shape):
+        """Start the ffmpeg process for frames with shape (height, width, 4).
+        """
+        height, width = shape[:2]
+        command = [
+            get_ffmpeg(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgba",
+            "-s",
+            "%sx%s" % (width, height),
+            "-r",
+            str(self.fps),
+            "-i",
+            "-",
+            # yuv420p needs an even width and height
+            "-vf",
+            "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        ]
+        command += codecs[self.extension] + [self.filename]
+        self.shape = shape
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def append_data(self, frame):
+        """Add the next frame, an array of RGBA values (uint8) with shape
+           (height, width, 4).
+        """
+        frame = numpy.ascontiguousarray(frame, dtype=numpy.uint8)
+        if frame.ndim != 3 or frame.shape[2] != 4:
+            sys.exit(
+                "Frames must have shape (height, width, 4), found %s" % (frame.shape,)
+            )
+        if self.process is None:
+            self.start(frame.shape)
+        if frame.shape != self.shape:
+            sys.exit(
+                "Frames must all have shape %s, found %s" % (self.shape, frame.shape)
+            )
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            self.process.wait()
+            sys.exit("ffmpeg stopped after %s frames, see above." % self.frames)
+        self.frames += 1
+
+    def close(self):
+        """Finish the video, and wait for ffmpeg to write it.
+        """
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            sys.exit("ffmpeg could not write %s, see above." % self.filename)
+        self.process = None
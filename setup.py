@@ -64,6 +64,7 @@ if __name__ == "__main__":
     INSTALL_REQUIRES = get_reqs(lookup)
     TESTS_REQUIRES = get_reqs(lookup, "TESTS_REQUIRES")
     ANIMATE_REQUIRES = get_reqs(lookup, "ANIMATE_REQUIRES")
+    VIDEO_REQUIRES = get_reqs(lookup, "VIDEO_REQUIRES")
     setup(
         name=NAME,
         version=VERSION,
@@ -81,9 +82,10 @@ if __name__ == "__main__":
         long_description_content_type="text/markdown",
         keywords=KEYWORDS,
         setup_requires=["pytest-runner"],
+        python_requires=">=3.9",
         install_requires=INSTALL_REQUIRES,
         tests_require=TESTS_REQUIRES,
-        extras_require={"animate": ANIMATE_REQUIRES},
+        extras_require={"animate": ANIMATE_REQUIRES, "video": VIDEO_REQUIRES},
         classifiers=[
             "Intended Audience :: Science/Research",
             "Intended Audience :: Developers",
@@ -93,7 +95,10 @@ if __name__ == "__main__":
             "Topic :: Software Development",
             "Topic :: Scientific/Engineering",
             "Operating System :: Unix",
-            "Programming Language :: Python :: 3.3",
+            "Programming Language :: Python :: 3",
+            "Programming Language :: Python :: 3.9",
+            "Programming Language :: Python :: 3.10",
+            "Programming Language :: Python :: 3.11",
         ],
         entry_points={"console_scripts": ["juliart=juliart.client:main"]},
     )